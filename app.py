@@ -1,24 +1,90 @@
 import dash
 import dash_auth
 import pandas as pd
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch, ctx
 import plotly.express as px
 import plotly.graph_objs as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from plotly.utils import PlotlyJSONEncoder
 import dash_bootstrap_components as dbc
 import numpy as np
 import re
 import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import io
+import time
+import threading
+import functools
+import collections
+import concurrent.futures
+import contextvars
+import resource
+import sqlite3
+import fcntl
+import urllib.parse
+import zlib
+import flask
+
+try:
+    # Optional: only the Parquet export needs it
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Dataset location; the columnar snapshot of it is kept in ONA_SNAPSHOT_DIR
+DATA_PATH = os.environ.get("ONA_CSV", "Ona.csv")
+SNAPSHOT_DIR = os.environ.get("ONA_SNAPSHOT_DIR", ".ona_snapshot")
+
+# Country name (or alias) -> ISO-3 code table used to place countries on the map
+COUNTRY_CODES_PATH = os.environ.get("ONA_COUNTRY_CODES", "countries.csv")
+
+# Figure cache: entries per worker, lifetime in seconds, and an optional
+# directory that lets all gunicorn workers share cached figures
+FIGURE_CACHE_SIZE = int(os.environ.get("ONA_FIGURE_CACHE_SIZE", "256"))
+FIGURE_CACHE_TTL = float(os.environ.get("ONA_FIGURE_CACHE_TTL", "3600"))
+FIGURE_CACHE_DIR = os.environ.get("ONA_FIGURE_CACHE_DIR")
+
+# Figure builds that may run at once in a worker, however many requests it serves
+FIGURE_BUILD_THREADS = int(os.environ.get("ONA_FIGURE_BUILD_THREADS", "2"))
+
+# Incremental ingestion: seconds between checks for rows appended to the CSV
+# (0 disables) and an optional directory of delta CSVs to fold in as they appear
+INGEST_INTERVAL = float(os.environ.get("ONA_INGEST_INTERVAL", "30"))
+DELTA_DIR = os.environ.get("ONA_DELTA_DIR")
+
+# Longest time series sent to the browser; longer ones are downsampled with LTTB
+MAX_TIME_POINTS = int(os.environ.get("ONA_MAX_TIME_POINTS", "500"))
+
+# Approximate mode (opt-in): charts first paint an estimate from a stratified
+# sample, with this many rows kept per (Continent, Country, Request Type)
+# stratum, and are redrawn once the exact figure is built in the background
+APPROXIMATE = os.environ.get("ONA_APPROXIMATE", "0") == "1"
+SAMPLE_PER_STRATUM = int(os.environ.get("ONA_SAMPLE_PER_STRATUM", "200"))
+
+# Rows per chunk of a streamed export (/api/export); bounds its memory use
+EXPORT_CHUNK_ROWS = int(os.environ.get("ONA_EXPORT_CHUNK_ROWS", "50000"))
+
+# Seconds between stack samples of the built-in profiler (0 disables it)
+PROFILE_INTERVAL = float(os.environ.get("ONA_PROFILE_INTERVAL", "0"))
+
+# Keep the dataset as integer-coded categoricals (ONA_COMPACT=0 keeps plain strings)
+COMPACT_DATA = os.environ.get("ONA_COMPACT", "1") == "1"
+
+# Where chart queries run: "memory" (the dataset, cubes and filter index in
+# every worker) or "sqlite" (an on-disk store shared by the workers, for
+# datasets larger than RAM)
+QUERY_BACKEND = os.environ.get("ONA_QUERY_BACKEND", "memory")
+SQLITE_PATH = os.environ.get("ONA_SQLITE_PATH") or os.path.join(SNAPSHOT_DIR, "ona.sqlite3")
  
-# Load your data
 # Define correct column names manually
 columns = ["Country", "Continent", "Age Group", "Gender", "Platform", "Request Type", "Job Type", "Referral Source", "Inquiry Time", "Date"]
 
-# Load the CSV by skipping the faulty header
-df = pd.read_csv("Ona.csv", sep=",", names=columns, skiprows=1)
-
-# Convert 'Date' column to datetime
-df["Date"] = pd.to_datetime(df["Date"])
-
 COUNTRY = "Country"
 CONTINENT = "Continent"
 AGE_GROUP = "Age Group"
@@ -29,6 +95,24 @@ JOB_TYPE = "Job Type"
 REFERRAL = "Referral Source"
 INQUIRY_TIME = "Inquiry Time"
 DATE = "Date"
+
+# Derived columns
+AGE_APPROX = "Age (approx)"
+INQUIRY_HOUR = "Inquiry Hour"
+WEEKDAY = "Weekday"
+MONTH = "Month"
+
+# Day bucket of the Date column (days since 1970-01-01), the time dimension of
+# the cubes and of the SQLite store
+DAY = "Day"
+
+# Weekday x hour-of-day buckets of the cubes: weekday * 24 + hour, Monday 00:00 = 0
+WEEK_HOUR = "Weekday Hour"
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEK_HOURS = list(range(7 * 24))
+
+# Open-ended age groups such as "56+" are assumed to span as many years as the closed ones
+OPEN_AGE_GROUP_YEARS = 10
  
 # Extract average from age group string
 def age_group_to_number(s):
@@ -36,13 +120,1428 @@ def age_group_to_number(s):
     match = re.match(r"(\d+)[^\d]+(\d+)", str(s))
     if match:
         return (int(match.group(1)) + int(match.group(2))) / 2
+    match = re.match(r"\s*(\d+)\s*\+", str(s))
+    if match:
+        return int(match.group(1)) + (OPEN_AGE_GROUP_YEARS - 1) / 2
     try:
         return float(s)
     except:
         return np.nan
- 
-df["Age (approx)"] = df[AGE_GROUP].apply(age_group_to_number)
-numeric_columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+
+# Apply func to each distinct value once and broadcast the results to the rows
+def map_unique(values, func, missing):
+    codes, uniques = pd.factorize(values)
+    results = np.asarray(func(np.asarray(uniques, dtype=object)))
+    # Code -1 (missing) picks the value appended at the end
+    return np.append(results, missing).astype(results.dtype)[codes]
+
+def read_ona_csv(path, header=True):
+    # Load the CSV by skipping the faulty header
+    frame = pd.read_csv(path, sep=",", names=columns, skiprows=1 if header else 0)
+
+    # Convert 'Date' column to datetime
+    frame["Date"] = pd.to_datetime(frame["Date"])
+
+    # Sparse columns keep their missing values as an explicit category
+    for col in SPARSE_COLUMNS:
+        frame[col] = frame[col].fillna(UNKNOWN)
+
+    return add_derived_columns(frame)
+
+# Low-cardinality text columns, stored as categoricals in compact mode
+CATEGORICAL_COLUMNS = [COUNTRY, CONTINENT, AGE_GROUP, GENDER, PLATFORM, REQUEST_TYPE, JOB_TYPE, REFERRAL]
+
+# Columns most rows leave empty by design (only job requests have a Job Type).
+# The loader stores their missing values as the UNKNOWN category, so every
+# store and cube counts them like any other value, and the statistics leave
+# UNKNOWN out instead of dropping NaNs on each call.
+SPARSE_COLUMNS = [JOB_TYPE]
+UNKNOWN = "Unknown"
+
+# Sentinels for missing values in the compact integer columns
+MISSING_MINUTE = -1
+MISSING_DAY = np.iinfo(np.int32).min
+
+# Minutes since midnight for "HH:MM" strings, parsed once per distinct value
+def inquiry_minutes(values):
+    if pd.api.types.is_integer_dtype(values):
+        return values.to_numpy(dtype=np.int16)
+
+    def parse(times):
+        parts = pd.Series(times, dtype="object").str.extract(r"^\s*(\d{1,2}):(\d{2})")
+        minutes = pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])
+        return minutes.fillna(MISSING_MINUTE).to_numpy(dtype=np.int16)
+
+    return map_unique(values, parse, MISSING_MINUTE)
+
+# Date as days since 1970-01-01, NaN where the date is missing
+def date_day_numbers(frame):
+    dates = frame[DATE]
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+        return pd.Series(days, index=frame.index).where(dates.notna())
+    return dates.where(dates != MISSING_DAY)
+
+# Age (approx), hour of day, weekday (Monday = 0) and month, each computed
+# once per distinct source value; -1 marks a missing hour, weekday or month
+def add_derived_columns(frame):
+    frame[AGE_APPROX] = map_unique(
+        frame[AGE_GROUP], lambda groups: np.array([age_group_to_number(g) for g in groups], dtype=float), np.nan
+    )
+
+    minutes = inquiry_minutes(frame[INQUIRY_TIME])
+    frame[INQUIRY_HOUR] = np.where(minutes >= 0, minutes // 60, -1).astype(np.int8)
+
+    days = date_day_numbers(frame)
+    known = days.notna().to_numpy()
+    days = days.fillna(0).to_numpy(dtype=np.int64)
+    # 1970-01-01 was a Thursday
+    frame[WEEKDAY] = np.where(known, (days + 3) % 7, -1).astype(np.int8)
+    months = map_unique(days, lambda d: pd.to_datetime(d.astype(np.int64), unit="D").month.to_numpy(), -1)
+    frame[MONTH] = np.where(known, months, -1).astype(np.int8)
+    return frame
+
+# Missing values per column of the CSV, UNKNOWN included for sparse columns;
+# recorded at load time and summed over ingested rows
+def missing_counts(frame):
+    counts = {}
+    for col in CATEGORICAL_COLUMNS:
+        missing = frame[col].isna()
+        if col in SPARSE_COLUMNS:
+            missing |= frame[col] == UNKNOWN
+        counts[col] = int(missing.sum())
+    counts[INQUIRY_TIME] = int((inquiry_minutes(frame[INQUIRY_TIME]) < 0).sum())
+    counts[DATE] = int(date_day_numbers(frame).isna().sum())
+    return {col: counts[col] for col in columns}
+
+# Weekday x hour bucket of each row from weekdays and hours (-1 where
+# missing); rows missing either get len(WEEK_HOURS)
+def week_hour_codes(weekdays, hours):
+    return np.where((weekdays < 0) | (hours < 0), len(WEEK_HOURS), weekdays.astype(np.int64) * 24 + hours)
+
+def compact_frame(frame):
+    frame = frame.copy()
+    for col in CATEGORICAL_COLUMNS:
+        frame[col] = frame[col].astype("category")
+    frame[INQUIRY_TIME] = inquiry_minutes(frame[INQUIRY_TIME])
+    frame[DATE] = date_day_numbers(frame).fillna(MISSING_DAY).to_numpy(dtype=np.int32)
+    return frame
+
+# New rows appended to frame; in compact mode the category dictionaries are
+# extended so codes already in frame keep their meaning
+def append_rows(frame, new_rows):
+    if COMPACT_DATA:
+        old_columns, new_columns = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            known = frame[col].cat.categories
+            extra = new_rows[col].cat.categories.difference(known)
+            old_columns[col] = frame[col].cat.add_categories(extra) if len(extra) else frame[col]
+            new_columns[col] = new_rows[col].cat.set_categories(known.append(extra))
+        frame, new_rows = frame.assign(**old_columns), new_rows.assign(**new_columns)
+    return pd.concat([frame, new_rows], ignore_index=True)
+
+# Columnar snapshot
+# The compact frame is written as one .npy file per column (categoricals as
+# their codes) plus a manifest holding the category dictionaries and the
+# size, mtime and SHA-256 of the CSV it was built from. Workers memory-map
+# these files instead of parsing the CSV, and rebuild them when the CSV changes.
+# Bump SNAPSHOT_VERSION whenever the stored columns change.
+SNAPSHOT_VERSION = 3
+
+# Hash of the file, or of its first `size` bytes
+def file_sha256(path, size=None):
+    digest = hashlib.sha256()
+    remaining = size if size is not None else float("inf")
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(int(min(1 << 20, remaining)))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+# Manifest of the snapshot if it still matches the CSV, otherwise None
+def current_snapshot(path):
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "current.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    built_from = manifest["source"]
+    source = file_fingerprint(path)
+    if built_from["path"] != source["path"] or built_from["size"] != source["size"]:
+        return None
+    if built_from["mtime_ns"] == source["mtime_ns"]:
+        return manifest
+    # The CSV was touched; it is only stale if its content changed
+    if file_sha256(path) == built_from["sha256"]:
+        built_from["mtime_ns"] = source["mtime_ns"]
+        write_manifest(manifest)
+        return manifest
+    return None
+
+def write_manifest(manifest):
+    fd, manifest_tmp = tempfile.mkstemp(prefix="current-", dir=SNAPSHOT_DIR)
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_tmp, os.path.join(SNAPSHOT_DIR, "current.json"))
+
+# force=True (--build-snapshot) replaces a snapshot of the same CSV content
+def write_snapshot(frame, source, force=False):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix="build-", dir=SNAPSHOT_DIR)
+    column_files = {}
+    for i, col in enumerate(frame.columns):
+        values = frame[col]
+        meta = {"file": f"{i}.npy"}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            meta["categories"] = list(values.cat.categories)
+            values = values.cat.codes
+        np.save(os.path.join(build_dir, meta["file"]), values.to_numpy())
+        column_files[col] = meta
+
+    # Snapshot directories are immutable; if another worker already built
+    # this one, keep theirs. A forced rebuild goes under a name of its own, so
+    # the manifest switches to it atomically and the old one is pruned below.
+    data_dir = f"v{SNAPSHOT_VERSION}-{source['sha256'][:16]}"
+    if force:
+        data_dir += "-" + os.path.basename(build_dir)
+    try:
+        os.rename(build_dir, os.path.join(SNAPSHOT_DIR, data_dir))
+    except OSError:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "source": source,
+        "rows": len(frame),
+        "data": data_dir,
+        "columns": column_files,
+    }
+    write_manifest(manifest)
+
+    # Drop superseded snapshots; workers still mapping them keep their open
+    # files. Only snapshot directories (v{N}-...) go: the partitioned store
+    # and other data may live in SNAPSHOT_DIR too.
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if os.path.isdir(path) and name != data_dir and re.match(r"v\d+-", name):
+            shutil.rmtree(path, ignore_errors=True)
+    return manifest
+
+def read_snapshot(manifest):
+    data_dir = os.path.join(SNAPSHOT_DIR, manifest["data"])
+    frame = {}
+    for col, meta in manifest["columns"].items():
+        values = np.load(os.path.join(data_dir, meta["file"]), mmap_mode="r")
+        if "categories" in meta:
+            values = pd.Categorical.from_codes(values, categories=meta["categories"])
+        frame[col] = values
+    # copy=False keeps every column backed by the read-only memory map, so
+    # all workers share the page cache instead of holding private copies
+    return pd.DataFrame(frame, copy=False)
+
+# Load your data
+# Returns the frame and the fingerprint of the CSV bytes it holds; the
+# fingerprint's size is where incremental ingestion picks up, and a prefix
+# of its SHA-256 is the dataset version caches use
+def load_dataset(path):
+    if COMPACT_DATA:
+        manifest = current_snapshot(path)
+        if manifest is not None:
+            frame = read_snapshot(manifest)
+            print(f"Ona dataset: {len(frame)} rows from snapshot {manifest['data']}, "
+                  f"{frame.memory_usage(deep=True).sum() / 1e6:.1f} MB compact")
+            return frame, manifest["source"]
+
+    # Hash and parse the same bytes, so rows appended meanwhile are left to ingestion
+    source = file_fingerprint(path)
+    with open(path, "rb") as f:
+        data = f.read(source["size"])
+    source["sha256"] = hashlib.sha256(data).hexdigest()
+    frame = read_ona_csv(io.BytesIO(data))
+    del data
+    if not COMPACT_DATA:
+        return frame, source
+
+    loaded_bytes = frame.memory_usage(deep=True).sum()
+    frame = compact_frame(frame)
+    compact_bytes = frame.memory_usage(deep=True).sum()
+    print(f"Ona dataset: {len(frame)} rows, {loaded_bytes / 1e6:.1f} MB as loaded, "
+          f"{compact_bytes / 1e6:.1f} MB compact ({loaded_bytes / compact_bytes:.0f}x smaller)")
+    try:
+        manifest = write_snapshot(frame, source)
+    except OSError as e:
+        print(f"Could not write the dataset snapshot to {SNAPSHOT_DIR}: {e}")
+        return frame, source
+    # Serve from the memory-mapped snapshot like every later start would
+    return read_snapshot(manifest), source
+
+# SQLite query backend
+# Ona.csv is streamed into a SQLite file once, in blocks, so it never has to
+# fit in memory. Charts push their filters and group-by down as one indexed
+# query that reads only the columns it needs; workers share the file and keep
+# just the dimension registry. Appended rows and delta files are inserted by
+# whichever worker sees them first, in the transaction that records them.
+SQLITE_STORE_VERSION = 2
+MINUTE = "Minute"
+STORE_COLUMNS = CATEGORICAL_COLUMNS + [DAY, MINUTE]
+SQLITE_INDEXED_COLUMNS = [CONTINENT, COUNTRY, REQUEST_TYPE]
+# Cube dimensions derived from stored columns (1970-01-01 was a Thursday)
+SQLITE_EXPRESSIONS = {WEEK_HOUR: '((("Day" + 3) % 7 + 7) % 7) * 24 + "Minute" / 60'}
+CSV_BLOCK_BYTES = 16 << 20
+
+def sqlite_name(col):
+    return '"' + col.replace('"', '""') + '"'
+
+# Complete-line blocks of the first `size` bytes of a file
+def read_csv_blocks(path, size):
+    with open(path, "rb") as f:
+        remaining, carry = size, b""
+        while remaining > 0:
+            data = f.read(min(CSV_BLOCK_BYTES, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = carry + data
+            cut = len(data) if remaining <= 0 else data.rfind(b"\n") + 1
+            carry = data[cut:]
+            if cut:
+                yield data[:cut]
+        if carry:
+            yield carry
+
+# Parsed rows in store layout: text columns with None for missing values,
+# Date as a day number and Inquiry Time as minutes since midnight
+def insert_store_rows(con, frame):
+    rows = {col: frame[col].astype(object).where(frame[col].notna(), None).to_numpy() for col in CATEGORICAL_COLUMNS}
+    days = date_day_numbers(frame)
+    rows[DAY] = np.array([None if np.isnan(d) else int(d) for d in days.to_numpy(dtype=float)], dtype=object)
+    minutes = inquiry_minutes(frame[INQUIRY_TIME])
+    rows[MINUTE] = np.array([None if m < 0 else int(m) for m in minutes], dtype=object)
+    placeholders = ", ".join("?" * len(STORE_COLUMNS))
+    con.executemany(f"INSERT INTO ona VALUES ({placeholders})", zip(*(rows[col] for col in STORE_COLUMNS)))
+    return len(frame)
+
+# Inserts rows and folds their distinct values, (Continent, Country) pairs and
+# date range into the manifest, which is all the dimension registry needs
+def add_store_rows(con, manifest, frame):
+    manifest["rows"] += insert_store_rows(con, frame)
+    for col, n in missing_counts(frame).items():
+        manifest["missing"][col] += n
+    for col in CATEGORICAL_COLUMNS:
+        manifest["values"][col] = sorted(set(manifest["values"][col]) | set(frame[col].dropna().astype(str)))
+    pairs = frame[[CONTINENT, COUNTRY]].astype(object)
+    pairs = pairs.where(pairs.notna(), None).drop_duplicates().itertuples(index=False, name=None)
+    manifest["locations"] = sorted(set(map(tuple, manifest["locations"])) | set(pairs), key=str)
+    days = date_day_numbers(frame).dropna()
+    if len(days):
+        first, last = int(days.min()), int(days.max())
+        if manifest["days"]:
+            first, last = min(first, manifest["days"][0]), max(last, manifest["days"][1])
+        manifest["days"] = [first, last]
+
+def read_store_manifest(con):
+    try:
+        row = con.execute("SELECT value FROM meta WHERE key = 'manifest'").fetchone()
+    except sqlite3.Error:
+        return None
+    return json.loads(row[0]) if row else None
+
+def write_store_manifest(con, manifest):
+    con.execute("INSERT OR REPLACE INTO meta VALUES ('manifest', ?)", (json.dumps(manifest),))
+
+def build_sqlite_store(path):
+    source = file_fingerprint(path)
+    os.makedirs(os.path.dirname(os.path.abspath(SQLITE_PATH)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(SQLITE_PATH)), suffix=".tmp")
+    os.close(fd)
+    con = sqlite3.connect(tmp_path)
+    try:
+        columns_sql = ", ".join(
+            f"{sqlite_name(col)} {'INTEGER' if col in (DAY, MINUTE) else 'TEXT'}" for col in STORE_COLUMNS
+        )
+        con.execute(f"CREATE TABLE ona ({columns_sql})")
+        con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        manifest = {
+            "version": SQLITE_STORE_VERSION, "source": source, "rows": 0,
+            "offset": source["size"], "mtime_ns": source["mtime_ns"], "deltas": [],
+            "values": {col: [] for col in CATEGORICAL_COLUMNS}, "locations": [], "days": None,
+            "missing": {col: 0 for col in columns},
+        }
+        # Hash and parse the same bytes, so rows appended meanwhile are left to ingestion
+        digest = hashlib.sha256()
+        for i, block in enumerate(read_csv_blocks(path, source["size"])):
+            digest.update(block)
+            add_store_rows(con, manifest, read_ona_csv(io.BytesIO(block), header=i == 0))
+        source["sha256"] = digest.hexdigest()
+
+        for col in SQLITE_INDEXED_COLUMNS:
+            con.execute(f"CREATE INDEX {sqlite_name('by ' + col)} ON ona ({sqlite_name(col)})")
+        write_store_manifest(con, manifest)
+        con.commit()
+        # Readers keep querying while a worker inserts ingested rows
+        con.execute("PRAGMA journal_mode=WAL")
+    finally:
+        con.close()
+    os.replace(tmp_path, SQLITE_PATH)
+    print(f"Ona dataset: {manifest['rows']} rows loaded into {SQLITE_PATH}")
+    return manifest
+
+# Whether an on-disk store still matches the CSV: rows appended since are
+# ingested as usual, only a changed prefix means a rebuild
+def store_covers(path, manifest):
+    built_from = manifest["source"]
+    current = file_fingerprint(path)
+    if built_from["path"] != current["path"] or current["size"] < manifest["offset"]:
+        return False
+    if current["size"] == manifest["offset"] and current["mtime_ns"] == manifest["mtime_ns"]:
+        return True
+    return file_sha256(path, built_from["size"]) == built_from["sha256"]
+
+# Manifest of the store if it still covers the start of the CSV, otherwise a
+# freshly built store's
+def open_sqlite_store(path):
+    manifest = None
+    if os.path.exists(SQLITE_PATH):
+        con = sqlite3.connect(SQLITE_PATH)
+        try:
+            manifest = read_store_manifest(con)
+        finally:
+            con.close()
+    if manifest is None or manifest["version"] != SQLITE_STORE_VERSION or not store_covers(path, manifest):
+        return build_sqlite_store(path)
+    print(f"Ona dataset: {manifest['rows']} rows in {SQLITE_PATH}")
+    return manifest
+
+# One connection per thread, reopened when the store file is replaced
+sqlite_local = threading.local()
+
+def sqlite_connection():
+    inode = os.stat(SQLITE_PATH).st_ino
+    if getattr(sqlite_local, "inode", None) != inode:
+        sqlite_local.connection = sqlite3.connect(SQLITE_PATH, timeout=60)
+        sqlite_local.inode = inode
+    return sqlite_local.connection
+
+# WHERE clause and parameters for equality filters (see select_rows)
+def sqlite_where(filters):
+    clauses, params = [], []
+    for filter_col, value in filters.items():
+        if not value:
+            continue
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        clauses.append(f"{sqlite_name(filter_col)} IN ({', '.join('?' * len(values))})")
+        params += values
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+# Row counts per value of col for equality filters (see select_rows); missing
+# values are counted under None
+def sqlite_group_counts(col, filters):
+    where, params = sqlite_where(filters)
+    name = SQLITE_EXPRESSIONS.get(col) or sqlite_name(col)
+    counts = dict(sqlite_connection().execute(f"SELECT {name}, COUNT(*) FROM ona{where} GROUP BY {name}", params))
+    record_scan(rows_matched=sum(counts.values()))
+    return counts
+
+# Partitioned column store
+# The rows are split by month of Date and by Continent into directories of
+# raw column files (text columns as codes into store-wide dictionaries),
+# memory-mapped on demand. The manifest keeps per-partition row counts, day
+# ranges and the set of codes present in every column, so a query skips every
+# partition that cannot match its filters and reads only the columns it needs
+# from the rest. Ingested rows are appended to the partition files before the
+# manifest that counts them is replaced, so readers never see partial rows.
+PARTITION_STORE_VERSION = 2
+PARTITION_DIR = os.environ.get("ONA_PARTITION_DIR") or os.path.join(SNAPSHOT_DIR, "partitions")
+PARTITION_DTYPES = dict({col: np.int32 for col in CATEGORICAL_COLUMNS}, **{DAY: np.int32, MINUTE: np.int16})
+MISSING_CODE = -1
+
+def partition_name(month, continent):
+    continent = "none" if continent is None else urllib.parse.quote(continent, safe="")
+    return f"month={month}/continent={continent}"
+
+# Codes of a column in the store dictionary, which grows with new values
+def store_codes(labels, values):
+    codes, uniques = pd.factorize(values)
+    lookup = {label: i for i, label in enumerate(labels)}
+    mapping = []
+    for value in map(str, uniques):
+        if value not in lookup:
+            lookup[value] = len(labels)
+            labels.append(value)
+        mapping.append(lookup[value])
+    # Code -1 (missing) picks the MISSING_CODE appended at the end
+    return np.append(np.array(mapping, dtype=np.int32), MISSING_CODE).astype(np.int32)[codes]
+
+def add_partition_rows(data_dir, manifest, frame):
+    columns = {col: store_codes(manifest["labels"][col], frame[col]) for col in CATEGORICAL_COLUMNS}
+    days = date_day_numbers(frame)
+    columns[DAY] = days.fillna(MISSING_DAY).to_numpy(dtype=np.int32)
+    columns[MINUTE] = inquiry_minutes(frame[INQUIRY_TIME])
+
+    known = days.notna().to_numpy()
+    months = map_unique(days.fillna(0).to_numpy(dtype=np.int64),
+                        lambda d: pd.to_datetime(d.astype(np.int64), unit="D").strftime("%Y-%m").to_numpy(dtype=object), "")
+    months = np.where(known, months, "none")
+    continents = frame[CONTINENT].astype(object).where(frame[CONTINENT].notna(), None).to_numpy()
+
+    keys = pd.DataFrame({"month": months, "continent": continents}).groupby(["month", "continent"], dropna=False, sort=True).indices
+    for (month, continent), rows in keys.items():
+        continent = None if pd.isna(continent) else continent
+        name = partition_name(month, continent)
+        partition = manifest["partitions"].setdefault(name, {
+            "month": month, "continent": continent, "rows": 0, "days": None,
+            "values": {col: [] for col in CATEGORICAL_COLUMNS},
+        })
+        os.makedirs(os.path.join(data_dir, name), exist_ok=True)
+        for col, dtype in PARTITION_DTYPES.items():
+            with open(os.path.join(data_dir, name, col + ".bin"), "ab") as f:
+                # Drop rows a failed earlier append left behind the manifest's count
+                f.truncate(partition["rows"] * np.dtype(dtype).itemsize)
+                f.write(columns[col][rows].astype(dtype).tobytes())
+        partition["rows"] += len(rows)
+        for col in CATEGORICAL_COLUMNS:
+            present = np.unique(columns[col][rows])
+            partition["values"][col] = sorted(set(partition["values"][col]) | set(present[present >= 0].tolist()))
+        partition_days = columns[DAY][rows]
+        partition_days = partition_days[partition_days != MISSING_DAY]
+        if len(partition_days):
+            first, last = int(partition_days.min()), int(partition_days.max())
+            if partition["days"]:
+                first, last = min(first, partition["days"][0]), max(last, partition["days"][1])
+            partition["days"] = [first, last]
+    manifest["rows"] += len(frame)
+    for col, n in missing_counts(frame).items():
+        manifest["missing"][col] += n
+
+def write_partition_manifest(manifest):
+    data_dir = os.path.join(PARTITION_DIR, manifest["data"])
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(data_dir, "manifest.json"))
+
+def read_partition_manifest():
+    try:
+        with open(os.path.join(PARTITION_DIR, "current.json")) as f:
+            current = json.load(f)
+        with open(os.path.join(PARTITION_DIR, current["data"], "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def build_partition_store(path):
+    source = file_fingerprint(path)
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    data_dir = tempfile.mkdtemp(dir=PARTITION_DIR, prefix=f"v{PARTITION_STORE_VERSION}-")
+    manifest = {
+        "version": PARTITION_STORE_VERSION, "data": os.path.basename(data_dir), "source": source, "rows": 0,
+        "offset": source["size"], "mtime_ns": source["mtime_ns"], "deltas": [],
+        "labels": {col: [] for col in CATEGORICAL_COLUMNS}, "partitions": {},
+        "missing": {col: 0 for col in columns},
+    }
+    # Hash and parse the same bytes, so rows appended meanwhile are left to ingestion
+    digest = hashlib.sha256()
+    for i, block in enumerate(read_csv_blocks(path, source["size"])):
+        digest.update(block)
+        add_partition_rows(data_dir, manifest, read_ona_csv(io.BytesIO(block), header=i == 0))
+    source["sha256"] = digest.hexdigest()
+    write_partition_manifest(manifest)
+
+    fd, tmp_path = tempfile.mkstemp(dir=PARTITION_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"data": manifest["data"]}, f)
+    os.replace(tmp_path, os.path.join(PARTITION_DIR, "current.json"))
+
+    # Drop older complete stores; builds still in progress have no manifest yet
+    for name in os.listdir(PARTITION_DIR):
+        old_dir = os.path.join(PARTITION_DIR, name)
+        if name != manifest["data"] and os.path.exists(os.path.join(old_dir, "manifest.json")):
+            shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"Ona dataset: {manifest['rows']} rows in {len(manifest['partitions'])} partitions under {PARTITION_DIR}")
+    return manifest
+
+def open_partition_store(path):
+    manifest = read_partition_manifest()
+    if manifest is None or manifest["version"] != PARTITION_STORE_VERSION or not store_covers(path, manifest):
+        return build_partition_store(path)
+    print(f"Ona dataset: {manifest['rows']} rows in {len(manifest['partitions'])} partitions under {PARTITION_DIR}")
+    return manifest
+
+# The on-disk backends open (or build) their store instead of loading the data
+STORE_BACKENDS = {"sqlite": open_sqlite_store, "partitioned": open_partition_store}
+
+if QUERY_BACKEND in STORE_BACKENDS:
+    STORE_MANIFEST = STORE_BACKENDS[QUERY_BACKEND](DATA_PATH)
+    df, DATA_SOURCE = None, STORE_MANIFEST["source"]
+else:
+    df, DATA_SOURCE = load_dataset(DATA_PATH)
+DATA_VERSION = DATA_SOURCE["sha256"][:16]
+if QUERY_BACKEND in STORE_BACKENDS:
+    # The store may already hold rows ingested by an earlier run
+    DATA_VERSION += f"-{STORE_MANIFEST['rows']}"
+numeric_columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])] if df is not None else []
+
+# Define the correct age group order
+AGE_ORDER = ["18-25", "26-35", "36-45", "46-55", "56+"]
+
+# Time granularities offered on the Time Period tab and their pandas frequencies
+TIME_GRANULARITIES = {"D": "D", "W": "W", "MS": "MS", "Y": "YE"}
+
+# Pre-aggregated count cubes
+# Every chart counts rows grouped by one column after filtering on Continent,
+# Country and Request Type. The cubes hold those counts for each
+# (Continent, Country) pair x Request Type x column value, so a callback only
+# sums a few small array slices instead of copying and re-scanning df.
+CUBE_DIMENSIONS = {
+    COUNTRY: None,
+    GENDER: None,
+    AGE_GROUP: AGE_ORDER,
+    PLATFORM: None,
+    JOB_TYPE: None,
+    REFERRAL: None,
+    WEEK_HOUR: WEEK_HOURS,
+    DAY: None,
+}
+
+# Integer codes for a column; missing or unknown values get code len(labels)
+def encode_column(values, labels=None):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Translate the category dictionary once and broadcast it over the codes
+        if labels is None:
+            labels = sorted(values.cat.remove_unused_categories().cat.categories)
+        lookup = pd.Index(labels).get_indexer(values.cat.categories)
+        lookup = np.append(np.where(lookup < 0, len(labels), lookup), len(labels))
+        return lookup[values.cat.codes.to_numpy()], list(labels)
+
+    if labels is None:
+        labels = sorted(values.dropna().unique())
+    codes = pd.Index(labels).get_indexer(values)
+    codes[codes < 0] = len(labels)
+    return codes, list(labels)
+
+# Codes of the Date column on a dense day axis running from the first to the
+# last date, so daily counts have no gaps; missing dates get len(labels)
+def encode_days(frame):
+    days = date_day_numbers(frame).to_numpy(dtype=float)
+    known = ~np.isnan(days)
+    if not known.any():
+        return np.zeros(len(frame), dtype=np.int64), pd.DatetimeIndex([])
+    first, last = int(days[known].min()), int(days[known].max())
+    codes = np.where(known, days - first, last - first + 1).astype(np.int64)
+    return codes, dense_days([pd.to_datetime(first, unit="D"), pd.to_datetime(last, unit="D")])
+
+def dense_days(labels):
+    if not len(labels):
+        return pd.DatetimeIndex([])
+    return pd.date_range(min(labels), max(labels), freq="D")
+
+# Daily time-series rollups
+# For each granularity, the bucket of every day in the dense day axis and the
+# bucket labels a resample would produce; weeks, months and years are then a
+# bincount over the daily counts instead of a resample of the rows.
+def time_buckets(days):
+    buckets = {}
+    for granularity, freq in TIME_GRANULARITIES.items():
+        first_day = pd.Series(np.arange(len(days)), index=days).resample(freq).min()
+        ids = np.searchsorted(first_day.to_numpy(), np.arange(len(days)), side="right") - 1
+        ids.setflags(write=False)
+        buckets[granularity] = (ids, first_day.index)
+    return buckets
+
+def build_cubes(frame):
+    continent_codes, continents = encode_column(frame[CONTINENT])
+    country_codes, countries = encode_column(frame[COUNTRY])
+
+    # One location per (Continent, Country) pair present in the data
+    pairs, location_codes = np.unique(
+        continent_codes * (len(countries) + 1) + country_codes, return_inverse=True
+    )
+    location_continents = np.array([(continents + [None])[i] for i in pairs // (len(countries) + 1)], dtype=object)
+    location_countries = np.array([(countries + [None])[i] for i in pairs % (len(countries) + 1)], dtype=object)
+
+    request_codes, requests = encode_column(frame[REQUEST_TYPE])
+    n_locations, n_requests = len(pairs), len(requests) + 1
+
+    dimensions = {}
+    for dimension, labels in CUBE_DIMENSIONS.items():
+        if dimension == DAY:
+            codes, labels = encode_days(frame)
+        elif dimension == WEEK_HOUR:
+            codes = week_hour_codes(frame[WEEKDAY].to_numpy(), frame[INQUIRY_HOUR].to_numpy())
+        else:
+            codes, labels = encode_column(frame[dimension], labels)
+        n_values = len(labels) + 1
+        flat = (location_codes * n_requests + request_codes) * n_values + codes
+        counts = np.bincount(flat, minlength=n_locations * n_requests * n_values)
+        # Read-only, so forked gunicorn workers keep sharing the master's pages
+        counts.setflags(write=False)
+        dimensions[dimension] = {
+            "labels": labels,
+            "counts": counts.reshape(n_locations, n_requests, n_values),
+        }
+    dimensions[DAY]["buckets"] = time_buckets(dimensions[DAY]["labels"])
+
+    return {
+        "continents": location_continents,
+        "countries": location_countries,
+        "requests": requests,
+        "dimensions": dimensions,
+        "missing": missing_counts(frame),
+    }
+
+# Only the memory backend keeps the dataset, cubes and filter index in memory
+CUBES = build_cubes(df) if QUERY_BACKEND == "memory" else None
+
+# Locations and requests of the cubes selected by the filters, or None when
+# the request type is not in the data
+def cube_selection(cubes, continent=None, country=None, request=None):
+    locations = np.ones(len(cubes["countries"]), dtype=bool)
+    if continent:
+        locations &= cubes["continents"] == continent
+    if country:
+        locations &= cubes["countries"] == country
+
+    if request:
+        if request not in cubes["requests"]:
+            return None
+        requests = [cubes["requests"].index(request)]
+    else:
+        requests = slice(None)
+    return locations, requests
+
+# Counts per code of a cube dimension (missing last) over the selection
+def cube_totals(cube, selection):
+    if selection is None:
+        return np.zeros(cube["counts"].shape[-1], dtype=np.int64)
+    locations, requests = selection
+    cells = cube["counts"][locations][:, requests]
+    record_scan(cube_cells=cells.size)
+    return cells.sum(axis=(0, 1))
+
+# Counts per value of a dimension for the given filters, read from the cubes;
+# filters on other columns (e.g. {GENDER: "Male"}) go through the filter index
+def cube_counts(dimension, continent=None, country=None, request=None, cubes=None, filters=None):
+    # Read the global once; ingestion swaps in whole new cube sets
+    cubes = cubes or CUBES
+    if filters and any(filters.values()):
+        index = FILTER_INDEX
+        rows = select_rows({**filters, CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request}, index)
+        return row_counts(dimension, rows, cubes, index)
+    cube = cubes["dimensions"][dimension]
+    selection = cube_selection(cubes, continent, country, request)
+    if selection is None:
+        return pd.Series(0, index=cube["labels"], dtype="int64")
+
+    counts = cube_totals(cube, selection)
+    record_scan(rows_matched=counts.sum())
+    return pd.Series(counts[:-1], index=cube["labels"], dtype="int64")
+
+# Requests per time bucket from the first to the last day with requests,
+# rolled up from the dense daily counts
+def time_series_counts(granularity, continent=None, country=None, request=None, filters=None):
+    daily, buckets = QUERY["day_counts"](continent, country, request, filters)
+    return roll_up_days(daily, buckets[granularity])
+
+def roll_up_days(daily, buckets):
+    bucket_ids, bucket_labels = buckets
+
+    days_with_requests = np.flatnonzero(daily)
+    if not len(days_with_requests):
+        return pd.DataFrame({DATE: pd.DatetimeIndex([]), "Number of Requests": np.zeros(0, dtype=np.int64)})
+
+    first, last = days_with_requests[0], days_with_requests[-1]
+    ids = bucket_ids[first:last + 1]
+    counts = np.bincount(ids - ids[0], weights=daily[first:last + 1]).astype(np.int64)
+    return pd.DataFrame({DATE: bucket_labels[ids[0]:ids[-1] + 1], "Number of Requests": counts})
+
+# Daily counts on the dense day axis and the time buckets of that axis, read
+# from the same cubes even if ingestion swaps them meanwhile
+def memory_day_counts(continent=None, country=None, request=None, filters=None):
+    cubes = CUBES
+    daily = cube_counts(DAY, continent, country, request, cubes, filters).to_numpy()
+    return daily, cubes["dimensions"][DAY]["buckets"]
+
+# Overview
+# Everything the tabs count for one filter selection, computed together for
+# the Overview tab and /api/overview: counts per label of each of
+# OVERVIEW_DIMENSIONS, the daily counts and the number of matching rows.
+# Each backend selects the matching rows (or cube cells) once and counts all
+# columns from that one selection instead of running a query per chart:
+#   overview(continent, country, request, filters) -> ({dimension: counts}, rows, day buckets)
+OVERVIEW_DIMENSIONS = [COUNTRY, GENDER, AGE_GROUP, PLATFORM, JOB_TYPE]
+
+def memory_overview(continent=None, country=None, request=None, filters=None):
+    cubes = CUBES
+    if filters and any(filters.values()):
+        index = FILTER_INDEX
+        rows = select_rows({**filters, CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request}, index)
+        counts = {dimension: row_counts(dimension, rows, cubes, index) for dimension in OVERVIEW_DIMENSIONS + [DAY]}
+        return counts, int(counts[DAY].sum()), cubes["dimensions"][DAY]["buckets"]
+    selection = cube_selection(cubes, continent, country, request)
+    counts = {}
+    for dimension in OVERVIEW_DIMENSIONS + [DAY]:
+        cube = cubes["dimensions"][dimension]
+        totals = cube_totals(cube, selection)
+        counts[dimension] = pd.Series(totals[:-1], index=cube["labels"], dtype="int64")
+    # Every cube counts each row once, missing values included
+    rows = int(totals.sum())
+    record_scan(rows_matched=rows)
+    return counts, rows, cubes["dimensions"][DAY]["buckets"]
+
+# Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the
+# visual shape of the series; first and last points are always kept
+def lttb_indices(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (just the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+# Cubes covering the rows of both inputs, e.g. the current cubes and the
+# cubes of newly ingested rows; labels that only one side has are added
+def merge_cubes(old, new):
+    old_locations = list(zip(old["continents"], old["countries"]))
+    new_locations = list(zip(new["continents"], new["countries"]))
+    locations = old_locations + [l for l in new_locations if l not in set(old_locations)]
+    location_index = {l: i for i, l in enumerate(locations)}
+
+    # Positions of one side's labels (and its trailing missing slot) in the merged labels
+    def positions(side_labels, labels):
+        index = {label: i for i, label in enumerate(labels)}
+        return [index[label] for label in side_labels] + [len(labels)]
+
+    requests = sorted(set(old["requests"]) | set(new["requests"]))
+    dimensions = {}
+    for dimension, fixed_labels in CUBE_DIMENSIONS.items():
+        old_cube, new_cube = old["dimensions"][dimension], new["dimensions"][dimension]
+        if dimension == DAY:
+            labels = dense_days(old_cube["labels"].append(new_cube["labels"]))
+        else:
+            labels = fixed_labels or sorted(set(old_cube["labels"]) | set(new_cube["labels"]))
+        counts = np.zeros((len(locations), len(requests) + 1, len(labels) + 1), dtype=np.int64)
+        for side, side_locations in ((old, old_locations), (new, new_locations)):
+            cube = side["dimensions"][dimension]
+            counts[np.ix_(
+                [location_index[l] for l in side_locations],
+                positions(side["requests"], requests),
+                positions(cube["labels"], labels),
+            )] += cube["counts"]
+        counts.setflags(write=False)
+        dimensions[dimension] = {"labels": labels, "counts": counts}
+    dimensions[DAY]["buckets"] = time_buckets(dimensions[DAY]["labels"])
+
+    return {
+        "continents": np.array([l[0] for l in locations], dtype=object),
+        "countries": np.array([l[1] for l in locations], dtype=object),
+        "requests": requests,
+        "dimensions": dimensions,
+        "missing": {col: old["missing"][col] + new["missing"][col] for col in columns},
+    }
+
+# Bitmap filter index
+# One packed bitmap (1 bit per row) per distinct value of each filterable
+# column. A multi-column selection is a bitwise AND of a few bitmaps, so row
+# level paths get their rows without building intermediate frames. The index
+# keeps the frames it describes so readers always see matching rows and bits.
+# Its first segment is the loaded (memory-mapped) frame; ingested rows go into
+# delta segments after it, so appending never copies the frame the workers share.
+FILTER_COLUMNS = [CONTINENT, COUNTRY, REQUEST_TYPE, PLATFORM, REFERRAL, GENDER, AGE_GROUP, JOB_TYPE]
+
+def index_segment(frame, filter_columns):
+    bitmaps = {}
+    for col in filter_columns:
+        codes, labels = encode_column(frame[col])
+        bitmaps[col] = {}
+        for i, label in enumerate(labels):
+            bits = np.packbits(codes == i)
+            bits.setflags(write=False)
+            bitmaps[col][label] = bits
+    return {"rows": len(frame), "bitmaps": bitmaps, "frame": frame}
+
+def build_filter_index(frame, filter_columns):
+    return {"rows": len(frame), "segments": [index_segment(frame, filter_columns)]}
+
+# Packed bits of n_old rows followed by the packed bits of n_new rows
+def concat_bits(old_bits, n_old, new_bits, n_new):
+    if n_old % 8 == 0:
+        return np.concatenate([old_bits, new_bits])
+    # Re-pack only the last partial byte of the old bitmap with the new bits
+    tail = np.unpackbits(old_bits[-1:])[:n_old % 8]
+    merged = np.packbits(np.concatenate([tail, np.unpackbits(new_bits, count=n_new)]))
+    return np.concatenate([old_bits[:-1], merged])
+
+# One segment of the rows of segment followed by those of later
+def merge_segments(segment, later):
+    n_old, n_new = segment["rows"], later["rows"]
+    bitmaps = {}
+    for col, old_bitmaps in segment["bitmaps"].items():
+        new_bitmaps = later["bitmaps"][col]
+        bitmaps[col] = {}
+        for value in set(old_bitmaps) | set(new_bitmaps):
+            old_bits = old_bitmaps.get(value, np.zeros((n_old + 7) // 8, dtype=np.uint8))
+            new_bits = new_bitmaps.get(value, np.zeros((n_new + 7) // 8, dtype=np.uint8))
+            bits = concat_bits(old_bits, n_old, new_bits, n_new)
+            bits.setflags(write=False)
+            bitmaps[col][value] = bits
+    return {"rows": n_old + n_new, "bitmaps": bitmaps, "frame": append_rows(segment["frame"], later["frame"])}
+
+# Index with new_rows appended; only the new rows are encoded. A delta segment
+# is merged into the one before it while that one is no larger, so there are
+# O(log) of them and each ingested row is re-copied O(log) times. The first
+# segment is never merged into.
+def extend_filter_index(index, new_rows):
+    columns = list(index["segments"][0]["bitmaps"])
+    segments = index["segments"] + [index_segment(new_rows, columns)]
+    while len(segments) > 2 and segments[-2]["rows"] <= segments[-1]["rows"]:
+        segments[-2:] = [merge_segments(segments[-2], segments[-1])]
+    return {"rows": index["rows"] + len(new_rows), "segments": segments}
+
+FILTER_INDEX = build_filter_index(df, FILTER_COLUMNS) if QUERY_BACKEND == "memory" else None
+
+def segment_rows(filters, segment):
+    selected = None
+    for col, value in filters.items():
+        if not value:
+            continue
+        column_bitmaps = segment["bitmaps"][col]
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        bits = np.zeros((segment["rows"] + 7) // 8, dtype=np.uint8)
+        for v in values:
+            if v in column_bitmaps:
+                bits |= column_bitmaps[v]
+        selected = bits if selected is None else selected & bits
+
+    if selected is None:
+        return None
+    return np.unpackbits(selected, count=segment["rows"]).view(bool)
+
+# Boolean row masks, one per index segment, for equality filters such as
+# {CONTINENT: "Africa", COUNTRY: None}; a list of values matches any of them,
+# empty values are ignored and None means every row is selected
+def select_rows(filters, index=None):
+    index = index or FILTER_INDEX
+    masks = [segment_rows(filters, segment) for segment in index["segments"]]
+    return None if masks[0] is None else masks
+
+# (segment frame, row mask or None) pairs of a selection
+def selected_segments(rows, index):
+    return zip([segment["frame"] for segment in index["segments"]], rows or [None] * len(index["segments"]))
+
+# Rows per value of col for the filters, most frequent first
+def memory_value_counts(col, filters):
+    index = FILTER_INDEX
+    rows = select_rows(filters, index)
+    parts = []
+    for frame, mask in selected_segments(rows, index):
+        values = frame[col] if mask is None else frame[col][mask]
+        record_scan(rows_matched=len(values))
+        parts.append(values.value_counts())
+    record_scan(rows_scanned=index["rows"])
+    counts = parts[0] if len(parts) == 1 else pd.concat(parts).groupby(level=0, observed=True).sum().sort_values(ascending=False, kind="stable")
+    return counts[counts > 0]
+
+# Columns of the dataset a cube dimension is derived from
+ROW_COUNT_SOURCES = {DAY: [DATE], WEEK_HOUR: [WEEKDAY, INQUIRY_HOUR]}
+
+# Counts per label of a cube dimension over the rows of the index's segments
+# selected by rows (masks from select_rows, or None for all rows); for filters
+# on columns the cubes have no axis for. Only the columns the dimension needs
+# are copied.
+def row_counts(dimension, rows, cubes, index):
+    labels = cubes["dimensions"][dimension]["labels"]
+    counts = np.zeros(len(labels) + 1, dtype=np.int64)
+    for frame, mask in selected_segments(rows, index):
+        values = frame[ROW_COUNT_SOURCES.get(dimension, [dimension])]
+        values = values if mask is None else values[mask]
+        record_scan(rows_matched=len(values))
+        counts += np.bincount(label_codes(dimension, values, labels), minlength=len(labels) + 1)
+    record_scan(rows_scanned=index["rows"])
+    return pd.Series(counts[:-1], index=labels, dtype="int64")
+
+# Codes of the labels of a cube dimension for rows of the dataset (len(labels) where missing)
+def label_codes(dimension, values, labels):
+    if dimension == DAY:
+        days = date_day_numbers(values).to_numpy(dtype=float)
+        first = labels[0].to_datetime64().astype("datetime64[D]").astype(np.int64) if len(labels) else 0
+        offsets = days - first
+        outside = np.isnan(days) | (offsets < 0) | (offsets >= len(labels))
+        return np.where(outside, len(labels), np.nan_to_num(offsets)).astype(np.int64)
+    if dimension == WEEK_HOUR:
+        return week_hour_codes(values[WEEKDAY].to_numpy(), values[INQUIRY_HOUR].to_numpy())
+    codes, _ = encode_column(values[dimension], labels)
+    return codes
+
+# Rows in the CSV's layout from the text columns ({col: values, None where
+# missing}), day numbers and minutes since midnight (MISSING_DAY and
+# MISSING_MINUTE where missing); the export of every backend ends here. The
+# UNKNOWN values the loader put in sparse columns go back to empty cells.
+def export_frame(text_columns, days, minutes):
+    frame = pd.DataFrame(text_columns, columns=CATEGORICAL_COLUMNS)
+    for col in SPARSE_COLUMNS:
+        frame[col] = frame[col].where(frame[col] != UNKNOWN, None)
+    frame[INQUIRY_TIME] = map_unique(
+        minutes, lambda m: np.array([f"{int(x) // 60:02d}:{int(x) % 60:02d}" if x >= 0 else None for x in m], dtype=object), None
+    )
+    frame[DATE] = pd.to_datetime(pd.Series(days, dtype="float64").where(days != MISSING_DAY), unit="D")
+    return frame[columns]
+
+# Matching rows of the filter index's segments, EXPORT_CHUNK_ROWS at a time.
+# The index is taken once, so ingestion swapping it mid-export changes nothing.
+def memory_export(filters):
+    index = FILTER_INDEX
+    rows = select_rows(filters, index)
+    record_scan(rows_scanned=index["rows"])
+    for frame, mask in selected_segments(rows, index):
+        positions = np.arange(len(frame)) if mask is None else np.flatnonzero(mask)
+        record_scan(rows_matched=len(positions))
+        for start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+            chunk = frame.iloc[positions[start:start + EXPORT_CHUNK_ROWS]]
+            text = {col: chunk[col].astype(object).where(chunk[col].notna(), None).to_numpy() for col in CATEGORICAL_COLUMNS}
+            days = date_day_numbers(chunk).fillna(MISSING_DAY).to_numpy(dtype=np.int64)
+            yield export_frame(text, days, inquiry_minutes(chunk[INQUIRY_TIME]))
+
+# Dimension registry
+# Sorted dropdown options per filterable column and the Continent -> Country
+# hierarchy. They are read off the filter index and the cube locations, so
+# tab switches and continent changes never touch the data.
+def build_dimensions(filter_index, cubes):
+    segments = filter_index["segments"]
+    values = {col: set().union(*(segment["bitmaps"][col] for segment in segments)) for col in segments[0]["bitmaps"]}
+    return dimension_registry(values, zip(cubes["continents"], cubes["countries"]))
+
+# Registry from the distinct values of each column and the (Continent, Country) pairs
+def dimension_registry(values_by_column, locations):
+    options = {
+        col: [{"label": v, "value": v} for v in sorted(values)]
+        for col, values in values_by_column.items()
+    }
+    countries_by_continent = {}
+    for continent, country in sorted(locations, key=str):
+        if continent is not None and country is not None:
+            countries_by_continent.setdefault(continent, []).append({"label": country, "value": country})
+    return {"options": options, "countries_by_continent": countries_by_continent}
+
+# SQLite backend queries
+# Labels, dense day axis and time buckets of the store, derived from its
+# manifest so they match what the cubes would hold for the same rows
+def sqlite_state(manifest):
+    values = manifest["values"]
+    labels = {dimension: fixed or values[dimension] for dimension, fixed in CUBE_DIMENSIONS.items() if dimension != DAY}
+    first, last = manifest["days"] or (None, None)
+    days = dense_days([] if first is None else [pd.to_datetime(first, unit="D"), pd.to_datetime(last, unit="D")])
+    return {
+        "rows": manifest["rows"],
+        "sha256": manifest["source"]["sha256"],
+        "labels": labels,
+        "first_day": first,
+        "days": days,
+        "buckets": time_buckets(days),
+        "dimensions": dimension_registry(values, [tuple(l) for l in manifest["locations"]]),
+        "missing": manifest["missing"],
+    }
+
+def sqlite_counts(dimension, continent=None, country=None, request=None, state=None, filters=None):
+    state = state or SQLITE_STATE
+    counts = sqlite_group_counts(dimension, {**(filters or {}), CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request})
+    return sqlite_series(state, dimension, counts)
+
+# Counts per label of a cube dimension from {value: count}
+def sqlite_series(state, dimension, counts):
+    if dimension == DAY:
+        daily = np.zeros(len(state["days"]), dtype=np.int64)
+        for day, count in counts.items():
+            if day is not None and 0 <= day - state["first_day"] < len(daily):
+                daily[day - state["first_day"]] = count
+        return pd.Series(daily, index=state["days"])
+    labels = state["labels"][dimension]
+    return pd.Series([counts.get(label, 0) for label in labels], index=labels, dtype="int64")
+
+def sqlite_day_counts(continent=None, country=None, request=None, filters=None):
+    state = SQLITE_STATE
+    return sqlite_counts(DAY, continent, country, request, state, filters).to_numpy(), state["buckets"]
+
+# SQLite has no GROUPING SETS, and handing it the matching rows to count in
+# Python costs more than its own GROUP BY per column. The per-column queries
+# run in one read transaction instead, so all counts come from the same
+# snapshot of the store even while ingestion appends rows.
+def sqlite_overview(continent=None, country=None, request=None, filters=None):
+    state = SQLITE_STATE
+    filters = {**(filters or {}), CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request}
+    con = sqlite_connection()
+    con.execute("BEGIN")
+    try:
+        counts = {dimension: sqlite_group_counts(dimension, filters) for dimension in OVERVIEW_DIMENSIONS + [DAY]}
+    finally:
+        con.commit()
+    rows = sum(counts[DAY].values())
+    return {dimension: sqlite_series(state, dimension, c) for dimension, c in counts.items()}, rows, state["buckets"]
+
+def sqlite_value_counts(col, filters):
+    counts = sqlite_group_counts(col, filters)
+    counts.pop(None, None)
+    counts = pd.Series(dict(sorted(counts.items())), dtype="int64")
+    return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+# Matching rows from one SELECT on a connection of its own, so the read
+# transaction spans the whole export and the thread's connection stays free
+def sqlite_export(filters):
+    where, params = sqlite_where(filters)
+    con = sqlite3.connect(SQLITE_PATH, timeout=60)
+    try:
+        cursor = con.execute(f"SELECT {', '.join(map(sqlite_name, STORE_COLUMNS))} FROM ona{where}", params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            record_scan(rows_matched=len(rows))
+            chunk = pd.DataFrame.from_records(rows, columns=STORE_COLUMNS)
+            text = {col: chunk[col].to_numpy(dtype=object) for col in CATEGORICAL_COLUMNS}
+            days = chunk[DAY].fillna(MISSING_DAY).to_numpy(dtype=np.int64)
+            yield export_frame(text, days, chunk[MINUTE].fillna(MISSING_MINUTE).to_numpy(dtype=np.int64))
+    finally:
+        con.close()
+
+# Partitioned backend queries
+# Store labels sorted like the cubes' labels, where each store code lands in
+# them, the dense day axis and the partitions' code sets for pruning
+def partition_state(manifest):
+    store_labels = manifest["labels"]
+    labels, positions = {}, {}
+    for dimension, fixed in CUBE_DIMENSIONS.items():
+        if dimension in (DAY, WEEK_HOUR):
+            continue
+        labels[dimension] = list(fixed or sorted(store_labels[dimension]))
+        lookup = pd.Index(labels[dimension]).get_indexer(store_labels[dimension])
+        # Codes outside the labels and MISSING_CODE (the last entry) count as missing
+        n = len(labels[dimension])
+        positions[dimension] = np.append(np.where(lookup < 0, n, lookup), n)
+
+    partitions = manifest["partitions"]
+    ranges = [p["days"] for p in partitions.values() if p["days"]]
+    first = min(r[0] for r in ranges) if ranges else None
+    last = max(r[1] for r in ranges) if ranges else None
+    days = dense_days([] if first is None else [pd.to_datetime(first, unit="D"), pd.to_datetime(last, unit="D")])
+
+    locations = set()
+    for partition in partitions.values():
+        for code in partition["values"][COUNTRY]:
+            locations.add((partition["continent"], store_labels[COUNTRY][code]))
+    return {
+        "rows": manifest["rows"],
+        "sha256": manifest["source"]["sha256"],
+        "data_dir": os.path.join(PARTITION_DIR, manifest["data"]),
+        "partitions": partitions,
+        "value_sets": {name: {col: set(codes) for col, codes in p["values"].items()} for name, p in partitions.items()},
+        "lookup": {col: {label: i for i, label in enumerate(values)} for col, values in store_labels.items()},
+        "store_labels": store_labels,
+        "labels": labels,
+        "positions": positions,
+        "first_day": first,
+        "days": days,
+        "buckets": time_buckets(days),
+        "dimensions": dimension_registry(store_labels, locations),
+        "missing": manifest["missing"],
+    }
+
+# Memory maps of partition columns, kept until the partition grows
+partition_maps = {}
+
+def partition_column(state, name, col):
+    rows = state["partitions"][name]["rows"]
+    path = os.path.join(state["data_dir"], name, col + ".bin")
+    column = partition_maps.get(path)
+    if column is None or len(column) < rows:
+        column = np.memmap(path, dtype=PARTITION_DTYPES[col], mode="r") if rows else np.zeros(0, PARTITION_DTYPES[col])
+        partition_maps[path] = column
+    return column[:rows]
+
+# (partition name, row mask or None for all rows) of the partitions that can
+# hold rows matching the equality filters (see select_rows)
+def scan_partitions(state, filters):
+    wanted = {}
+    for col, value in filters.items():
+        if not value:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        wanted[col] = {state["lookup"][col][v] for v in values if v in state["lookup"][col]}
+
+    scanned = skipped = rows_scanned = 0
+    selected = []
+    for name, value_sets in state["value_sets"].items():
+        if any(not codes & value_sets[col] for col, codes in wanted.items()):
+            skipped += 1
+            continue
+        mask = None
+        for col, codes in wanted.items():
+            # A filter every row of the partition meets, e.g. its Continent, costs nothing
+            if value_sets[col] <= codes:
+                continue
+            matches = np.isin(partition_column(state, name, col), list(codes))
+            mask = matches if mask is None else mask & matches
+        scanned += 1
+        rows_scanned += state["partitions"][name]["rows"]
+        selected.append((name, mask))
+    record_scan(partitions_scanned=scanned, partitions_skipped=skipped, rows_scanned=rows_scanned)
+    return selected
+
+# Cube dimensions binned from several stored columns, passed to to_bins in this order
+PARTITION_SOURCES = {WEEK_HOUR: [DAY, MINUTE]}
+
+# Counts per bin of each column of bins, {col: (n_bins, to_bins)} with missing
+# values in an extra last bin, over the matching rows of one partition scan
+def partition_code_counts(state, bins, filters):
+    counts = {col: np.zeros(n_bins + 1, dtype=np.int64) for col, (n_bins, _) in bins.items()}
+    for name, mask in scan_partitions(state, filters):
+        for col, (n_bins, to_bins) in bins.items():
+            columns = [partition_column(state, name, source) for source in PARTITION_SOURCES.get(col, [col])]
+            if mask is not None:
+                columns = [values[mask] for values in columns]
+            counts[col] += np.bincount(to_bins(*columns), minlength=n_bins + 1)
+    record_scan(rows_matched=next(iter(counts.values())).sum())
+    return counts
+
+# Labels of a cube dimension and its (n_bins, to_bins) over store codes
+def partition_bins(state, dimension):
+    if dimension == DAY:
+        n = len(state["days"])
+        first = state["first_day"] or 0
+        return state["days"], (n, lambda days: np.where((days == MISSING_DAY) | (days - first >= n), n, days - first))
+    if dimension == WEEK_HOUR:
+        to_bins = lambda days, minutes: week_hour_codes(
+            np.where(days == MISSING_DAY, -1, (days + 3) % 7), np.where(minutes < 0, -1, minutes // 60)
+        )
+        return WEEK_HOURS, (len(WEEK_HOURS), to_bins)
+    labels, positions = state["labels"][dimension], state["positions"][dimension]
+    return labels, (len(labels), lambda codes: positions[codes])
+
+def partition_counts(dimension, continent=None, country=None, request=None, state=None, filters=None):
+    state = state or PARTITION_STATE
+    labels, bins = partition_bins(state, dimension)
+    filters = {**(filters or {}), CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request}
+    counts = partition_code_counts(state, {dimension: bins}, filters)
+    return pd.Series(counts[dimension][:-1], index=labels, dtype="int64")
+
+def partition_day_counts(continent=None, country=None, request=None, filters=None):
+    state = PARTITION_STATE
+    return partition_counts(DAY, continent, country, request, state, filters).to_numpy(), state["buckets"]
+
+def partition_overview(continent=None, country=None, request=None, filters=None):
+    state = PARTITION_STATE
+    bins = {dimension: partition_bins(state, dimension) for dimension in OVERVIEW_DIMENSIONS + [DAY]}
+    counts = partition_code_counts(state, {dimension: b for dimension, (_, b) in bins.items()},
+                                   {**(filters or {}), CONTINENT: continent, COUNTRY: country, REQUEST_TYPE: request})
+    series = {dimension: pd.Series(counts[dimension][:-1], index=labels, dtype="int64") for dimension, (labels, _) in bins.items()}
+    return series, int(counts[DAY].sum()), state["buckets"]
+
+def partition_value_counts(col, filters):
+    state = PARTITION_STATE
+    labels = state["store_labels"][col]
+    bins = (len(labels), lambda codes: np.where(codes < 0, len(labels), codes))
+    counts = partition_code_counts(state, {col: bins}, filters)[col]
+    counts = pd.Series(counts[:-1], index=labels, dtype="int64").sort_index()
+    return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+# Matching rows of the partitions a scan keeps, decoded chunk by chunk
+def partition_export(filters):
+    state = PARTITION_STATE
+    # Store labels by code, with None last for MISSING_CODE (-1)
+    decode = {col: np.array(labels + [None], dtype=object) for col, labels in state["store_labels"].items()}
+    for name, mask in scan_partitions(state, filters):
+        positions = np.arange(state["partitions"][name]["rows"]) if mask is None else np.flatnonzero(mask)
+        record_scan(rows_matched=len(positions))
+        for start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+            rows = positions[start:start + EXPORT_CHUNK_ROWS]
+            text = {col: decode[col][partition_column(state, name, col)[rows]] for col in CATEGORICAL_COLUMNS}
+            days = partition_column(state, name, DAY)[rows]
+            yield export_frame(text, days, partition_column(state, name, MINUTE)[rows])
+
+# Query backends
+# The charts only ever count rows per value of one column after equality
+# filters; each backend answers those queries its own way:
+#   counts(dimension, continent, country, request) -> counts per label of a cube dimension
+#   day_counts(continent, country, request)        -> daily counts and their time buckets
+#   value_counts(col, filters)                     -> counts per value of any column
+#   overview(continent, country, request)          -> all overview counts at once (see Overview)
+#   export(filters)                                -> matching rows, EXPORT_CHUNK_ROWS at a time (see Export)
+#   dimensions() / rows() / missing()              -> dimension registry, row count and
+#                                                     missing values per column (see missing_counts)
+# counts, day_counts and overview also take filters, equality filters on other
+# columns such as {GENDER: "Male"} (the cross-filters of the dashboard).
+QUERY_BACKENDS = {
+    "memory": {
+        "counts": cube_counts,
+        "day_counts": memory_day_counts,
+        "value_counts": memory_value_counts,
+        "overview": memory_overview,
+        "export": memory_export,
+        "dimensions": lambda: build_dimensions(FILTER_INDEX, CUBES),
+        "rows": lambda: FILTER_INDEX["rows"],
+        "missing": lambda: CUBES["missing"],
+    },
+    "sqlite": {
+        "counts": sqlite_counts,
+        "day_counts": sqlite_day_counts,
+        "value_counts": sqlite_value_counts,
+        "overview": sqlite_overview,
+        "export": sqlite_export,
+        "dimensions": lambda: SQLITE_STATE["dimensions"],
+        "rows": lambda: SQLITE_STATE["rows"],
+        "missing": lambda: SQLITE_STATE["missing"],
+    },
+    "partitioned": {
+        "counts": partition_counts,
+        "day_counts": partition_day_counts,
+        "value_counts": partition_value_counts,
+        "overview": partition_overview,
+        "export": partition_export,
+        "dimensions": lambda: PARTITION_STATE["dimensions"],
+        "rows": lambda: PARTITION_STATE["rows"],
+        "missing": lambda: PARTITION_STATE["missing"],
+    },
+}
+QUERY = QUERY_BACKENDS[QUERY_BACKEND]
+
+if QUERY_BACKEND == "sqlite":
+    SQLITE_STATE = sqlite_state(STORE_MANIFEST)
+elif QUERY_BACKEND == "partitioned":
+    PARTITION_STATE = partition_state(STORE_MANIFEST)
+
+DIMENSIONS = QUERY["dimensions"]()
+
+def dropdown_options(col):
+    return DIMENSIONS["options"][col]
+
+# Country dimension
+# Country names are resolved to ISO-3 codes here rather than by Plotly's
+# name matching on every render, which drops names it does not know without
+# a word. Each set of country labels is resolved once - at load time and
+# again only when ingestion brings new countries - and names without a code
+# are reported and left off the map.
+def normalize_country(name):
+    return " ".join(str(name).split()).casefold()
+
+def read_country_codes(path):
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return {normalize_country(name): code for name, code in zip(table[COUNTRY], table["ISO-3"])}
+
+COUNTRY_CODES = read_country_codes(COUNTRY_CODES_PATH)
+UNMATCHED_COUNTRIES = set()
+
+# ISO-3 code per country label (None where there is none), for a tuple of labels
+@functools.lru_cache(maxsize=8)
+def country_locations(labels):
+    codes = np.array([COUNTRY_CODES.get(normalize_country(name)) for name in labels], dtype=object)
+    unmatched = [name for name, code in zip(labels, codes) if code is None and name not in UNMATCHED_COUNTRIES]
+    if unmatched:
+        UNMATCHED_COUNTRIES.update(unmatched)
+        print(f"No ISO-3 code in {COUNTRY_CODES_PATH} for {', '.join(map(str, unmatched))}; left off the map")
+    return codes
+
+country_locations(tuple(option["value"] for option in dropdown_options(COUNTRY)))
+
+# Statistics engine
+# Every Statistics metric is a reduction of one vector: requests per value of
+# a group-by column for one Request Type. The vectors of all Request Types are
+# counted once per dataset version and group-by column, so metric changes and
+# the comparison table never query the data again.
+STATS_DIMENSIONS = {JOB_TYPE: "job", PLATFORM: "platform", REFERRAL: "referral"}
+STATS_METRICS = {
+    "mean": "Mean",
+    "median": "Median",
+    "mode": "Mode",
+    "std": "Standard Deviation",
+    "count": "Count",
+    "p25": "25th Percentile",
+    "p75": "75th Percentile",
+    "p90": "90th Percentile",
+}
+STATS_PERCENTILES = {"p25": 25, "p75": 75, "p90": 90}
+stats_tables = {"version": None, "tables": {}}
+stats_lock = threading.Lock()
+
+# Requests per Request Type (rows) and value of dimension (columns); UNKNOWN
+# is left out, so the vectors hold only the non-null counts
+def stats_table(dimension):
+    version = DATA_VERSION
+    with stats_lock:
+        if stats_tables["version"] == version and dimension in stats_tables["tables"]:
+            return stats_tables["tables"][dimension]
+    requests = [option["value"] for option in DIMENSIONS["options"][REQUEST_TYPE]]
+    table = pd.DataFrame(
+        [QUERY["counts"](dimension, None, None, request) for request in requests], index=requests
+    ).drop(columns=UNKNOWN, errors="ignore")
+    with stats_lock:
+        # Tables of an older dataset version are never read again
+        if stats_tables["version"] != version:
+            stats_tables.update(version=version, tables={})
+        stats_tables["tables"][dimension] = table
+    return table
+
+# Requests per value of dimension for one Request Type, values without requests left out
+def stats_counts(dimension, request):
+    table = stats_table(dimension)
+    if request not in table.index:
+        return pd.Series(dtype="int64")
+    counts = table.loc[request]
+    return counts[counts > 0]
+
+def stats_metric(counts, metric):
+    if metric == "mean":
+        return counts.mean()
+    elif metric == "median":
+        return counts.median()
+    elif metric == "mode":
+        mode_val = counts.mode()
+        return mode_val[0] if not mode_val.empty else "N/A"
+    elif metric == "std":
+        return counts.std()
+    elif metric == "count":
+        return counts.sum()
+    return counts.quantile(STATS_PERCENTILES[metric] / 100)
+
+# Missing values per column of the dataset, as recorded at load time
+def missing_value_table():
+    rows = QUERY["rows"]()
+    missing = pd.Series(QUERY["missing"]())
+    return pd.DataFrame({
+        "Column": missing.index,
+        "Missing": missing.to_numpy(),
+        "Missing %": (100 * missing / rows).round(1).to_numpy() if rows else 0.0,
+        "Present": rows - missing.to_numpy(),
+    })
+
+# Null rates of every column, with Unknown counted as missing for sparse
+# columns. They only change with the dataset, so the table ships with the
+# Statistics content in UI_DATA instead of coming from a callback.
+def missing_value_component():
+    table = missing_value_table()
+    table["Column"] = [f"{col} ({UNKNOWN})" if col in SPARSE_COLUMNS else col for col in table["Column"]]
+    return dbc.Table.from_dataframe(table, striped=True, bordered=True, hover=True, size="sm")
  
 # New color palette and styling
 BACKGROUND_COLOR = '#f9f9f9'
@@ -51,6 +1550,18 @@ SECONDARY_COLOR = '#EF553B'
 TEXT_COLOR = '#1f2c56'
 ACCENT_COLOR = '#00cc96'
 GRAPH_COLORS = [PRIMARY_COLOR, SECONDARY_COLOR, ACCENT_COLOR, '#ab63fa', '#FFA15A']
+
+# The stock "plotly" template carries defaults for every trace type and 3D/polar
+# scene (~7 KB per figure); keep only what the dashboard draws
+def slim_template(base, trace_types):
+    template = json.loads(json.dumps(pio.templates[base].to_plotly_json(), cls=PlotlyJSONEncoder))
+    template["data"] = {k: v for k, v in template["data"].items() if k in trace_types}
+    for key in ("polar", "ternary", "scene", "mapbox"):
+        template["layout"].pop(key, None)
+    return go.layout.Template(template)
+
+pio.templates["ona"] = slim_template("plotly", ("scatter", "bar", "pie", "choropleth"))
+pio.templates.default = "ona"
  
 dropdown_style = {
     'width': '100%',
@@ -185,6 +1696,12 @@ tabs = dcc.Tabs(
             selected_style=tab_selected_style,
             style=tab_style
         ),
+        dcc.Tab(
+            label="🕒 Weekday × Hour",
+            value="weekday_hour",
+            selected_style=tab_selected_style,
+            style=tab_style
+        ),
         dcc.Tab(
             label="🛒 Product Interest",
             value="product",
@@ -202,39 +1719,131 @@ tabs = dcc.Tabs(
             value="statistical_analysis",
             selected_style=tab_selected_style,
             style=tab_style
+        ),
+        dcc.Tab(
+            label="📋 Overview",
+            value="overview",
+            selected_style=tab_selected_style,
+            style=tab_style
         )
     ]
 )
 
 # Main content area
 main_content = html.Div(id="main-content", style=graph_container_style)
+
+# Cross-filtering
+# One filter state for the whole dashboard lives in the filter-store. The
+# dropdowns of every tab and clicks on the map, the gender and age bars and
+# the platform donut write to it, so a selection carries over between tabs.
+# Each chart reads a derived store holding only the filters it depends on;
+# a chart is not filtered by the dimension it plots, so clicking a bar keeps
+# its own chart whole. The derived stores are updated clientside and only
+# when their filters change, so an action re-runs only the server callbacks
+# of the charts it affects.
+GLOBAL_FILTERS = [CONTINENT, COUNTRY, REQUEST_TYPE, GENDER, AGE_GROUP, PLATFORM]
+# Filters the count cubes have no axis for, passed to QUERY as filters
+CROSS_FILTERS = [GENDER, AGE_GROUP, PLATFORM]
+
+# Query parameters of the API endpoints and the filters they set; gender,
+# age_group and platform narrow the results like the cross-filters
+API_FILTERS = {
+    "continent": CONTINENT, "country": COUNTRY, "request": REQUEST_TYPE,
+    "gender": GENDER, "age_group": AGE_GROUP, "platform": PLATFORM,
+}
+
+# Id prefix of each tab and the filter set by each of its dropdowns
+TAB_FILTERS = {
+    "geographical": ("geo", {
+        "geo-continent-filter": CONTINENT, "geo-country-filter": COUNTRY, "geo-request-type-filter": REQUEST_TYPE,
+    }),
+    "gender_distribution": ("gender", {
+        "gender-continent-filter": CONTINENT, "gender-country-filter": COUNTRY, "request-type-gender-filter": REQUEST_TYPE,
+    }),
+    "time_period": ("time", {
+        "time-continent-filter": CONTINENT, "time-country-filter": COUNTRY, "time-request-type-filter": REQUEST_TYPE,
+    }),
+    "weekday_hour": ("heatmap", {
+        "heatmap-continent-filter": CONTINENT, "heatmap-country-filter": COUNTRY, "heatmap-request-type-filter": REQUEST_TYPE,
+    }),
+    "product": ("product", {
+        "product-continent-filter": CONTINENT, "product-country-filter": COUNTRY,
+    }),
+    "age_distribution": ("age", {
+        "age-continent-filter": CONTINENT, "age-country-filter": COUNTRY, "request-type-age-filter": REQUEST_TYPE,
+    }),
+    "statistical_analysis": ("statistical", {
+        "statistical-request-filter": REQUEST_TYPE,
+    }),
+    "overview": ("overview", {
+        "overview-continent-filter": CONTINENT, "overview-country-filter": COUNTRY, "overview-request-type-filter": REQUEST_TYPE,
+    }),
+}
+
+# Graphs whose clicks set a filter: tab -> (graph id, filter, clicked point property)
+CLICK_FILTERS = {
+    "geographical": ("geo-distribution-graph", COUNTRY, "customdata"),
+    "gender_distribution": ("gender-distribution-graph", GENDER, "y"),
+    "age_distribution": ("age-distribution-graph", AGE_GROUP, "x"),
+    "product": ("product-interest-map", PLATFORM, "label"),
+}
+
+# Derived store of each chart and the filters the chart depends on
+CHART_FILTERS = {
+    "geo-filters": [f for f in GLOBAL_FILTERS if f != COUNTRY],
+    "gender-filters": [f for f in GLOBAL_FILTERS if f != GENDER],
+    "age-filters": [f for f in GLOBAL_FILTERS if f != AGE_GROUP],
+    "product-filters": [f for f in GLOBAL_FILTERS if f != PLATFORM],
+    "time-filters": GLOBAL_FILTERS,
+    "heatmap-filters": GLOBAL_FILTERS,
+    "overview-filters": GLOBAL_FILTERS,
+}
+
+# The active filters, a clear button and a download of the filtered rows,
+# under the dropdowns of a tab
+def cross_filter_controls(prefix):
+    return [
+        html.Div(id=f"{prefix}-active-filters", style={'fontSize': '0.9rem', 'marginBottom': '0.75rem'}),
+        html.Button("Clear filters", id=f"{prefix}-clear-filters", n_clicks=0,
+                    className="btn btn-outline-secondary btn-sm"),
+        html.A("⬇ Download CSV", id=f"{prefix}-export-link", href="/api/export",
+               className="btn btn-outline-primary btn-sm", style={'marginLeft': '0.5rem'}),
+    ]
+
+# Figure builder arguments from a chart's filters: continent, country, request
+# type and the cross-filters as sorted (column, value) pairs, or None
+def chart_filter_args(filters):
+    filters = filters or {}
+    cross = tuple(sorted((col, filters[col]) for col in CROSS_FILTERS if filters.get(col))) or None
+    return filters.get(CONTINENT), filters.get(COUNTRY), filters.get(REQUEST_TYPE), cross
  
-app_analysis.layout = html.Div([
-    header,
-    tabs,
-    dbc.Row([
-        dbc.Col([sidebar_filters], md=3, style={'paddingRight': '1rem'}),
-        dbc.Col([main_content], md=9, style={'paddingLeft': '1rem'})
-    ], style={'marginTop': '1rem'})
-], style={
-    'backgroundColor': '#f8f9fc',
-    'minHeight': '100vh',
-    'padding': '20px',
-    'color': TEXT_COLOR
-})
-
-# Callback to update sidebar filters based on selected tab
-@app_analysis.callback(
-    Output("dynamic-filters", "children"),
-    [Input("main-tabs", "value")]
-)
+# Built on every page load so the UI data in the store follows the dataset
+def serve_layout():
+    return html.Div([
+        dcc.Store(id="ui-store", data=UI_DATA),
+        dcc.Store(id="filter-store", data={col: None for col in GLOBAL_FILTERS}),
+        *[dcc.Store(id=store_id) for store_id in CHART_FILTERS],
+        header,
+        tabs,
+        dbc.Row([
+            dbc.Col([sidebar_filters], md=3, style={'paddingRight': '1rem'}),
+            dbc.Col([main_content], md=9, style={'paddingLeft': '1rem'})
+        ], style={'marginTop': '1rem'})
+    ], style={
+        'backgroundColor': '#f8f9fc',
+        'minHeight': '100vh',
+        'padding': '20px',
+        'color': TEXT_COLOR
+    })
+
+# Sidebar filters for the selected tab
 def update_sidebar_filters(selected_tab):
     if selected_tab == "geographical":
         return [
             html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="geo-continent-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[CONTINENT].dropna().unique())],
+                options=dropdown_options(CONTINENT),
                 value=None,
                 clearable=True,
                 placeholder="Select Continent",
@@ -243,7 +1852,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="geo-country-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())],
+                options=dropdown_options(COUNTRY),
                 value=None,
                 clearable=True,
                 placeholder="Select Country",
@@ -252,7 +1861,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="geo-request-type-filter",
-                options=[{"label": rt, "value": rt} for rt in sorted(df[REQUEST_TYPE].dropna().unique())],
+                options=dropdown_options(REQUEST_TYPE),
                 value=None,
                 clearable=True,
                 placeholder="Select Request Type",
@@ -265,7 +1874,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="gender-continent-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[CONTINENT].dropna().unique())],
+                options=dropdown_options(CONTINENT),
                 value=None,
                 clearable=True,
                 placeholder="Select Continent",
@@ -274,7 +1883,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="gender-country-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())],
+                options=dropdown_options(COUNTRY),
                 value=None,
                 clearable=True,
                 placeholder="Select Country",
@@ -283,7 +1892,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="request-type-gender-filter",
-                options=[{"label": rt, "value": rt} for rt in sorted(df[REQUEST_TYPE].dropna().unique())],
+                options=dropdown_options(REQUEST_TYPE),
                 value=None,
                 clearable=True,
                 placeholder="Select Request Type",
@@ -296,7 +1905,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="time-continent-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[CONTINENT].dropna().unique())],
+                options=dropdown_options(CONTINENT),
                 value=None,
                 clearable=True,
                 placeholder="Select Continent",
@@ -305,7 +1914,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="time-country-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())],
+                options=dropdown_options(COUNTRY),
                 value=None,
                 clearable=True,
                 placeholder="Select Country",
@@ -327,7 +1936,38 @@ def update_sidebar_filters(selected_tab):
             html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="time-request-type-filter",
-                options=[{"label": rt, "value": rt} for rt in sorted(df[REQUEST_TYPE].dropna().unique())],
+                options=dropdown_options(REQUEST_TYPE),
+                value=None,
+                clearable=True,
+                placeholder="Select Request Type",
+                style=dropdown_style
+            ),
+        ]
+    
+    elif selected_tab == "weekday_hour":
+        return [
+            html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="heatmap-continent-filter",
+                options=dropdown_options(CONTINENT),
+                value=None,
+                clearable=True,
+                placeholder="Select Continent",
+                style=dropdown_style
+            ),
+            html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="heatmap-country-filter",
+                options=dropdown_options(COUNTRY),
+                value=None,
+                clearable=True,
+                placeholder="Select Country",
+                style=dropdown_style
+            ),
+            html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="heatmap-request-type-filter",
+                options=dropdown_options(REQUEST_TYPE),
                 value=None,
                 clearable=True,
                 placeholder="Select Request Type",
@@ -340,7 +1980,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="product-continent-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[CONTINENT].dropna().unique())],
+                options=dropdown_options(CONTINENT),
                 value=None,
                 clearable=True,
                 placeholder="Select Continent",
@@ -349,7 +1989,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="product-country-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())],
+                options=dropdown_options(COUNTRY),
                 value=None,
                 clearable=True,
                 placeholder="Select Country",
@@ -362,7 +2002,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="age-continent-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[CONTINENT].dropna().unique())],
+                options=dropdown_options(CONTINENT),
                 value=None,
                 clearable=True,
                 placeholder="Select Continent",
@@ -371,7 +2011,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="age-country-filter",
-                options=[{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())],
+                options=dropdown_options(COUNTRY),
                 value=None,
                 clearable=True,
                 placeholder="Select Country",
@@ -380,7 +2020,7 @@ def update_sidebar_filters(selected_tab):
             html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="request-type-age-filter",
-                options=[{"label": rt, "value": rt} for rt in sorted(df[REQUEST_TYPE].dropna().unique())],
+                options=dropdown_options(REQUEST_TYPE),
                 value=None,
                 clearable=True,
                 placeholder="Select Request Type",
@@ -393,86 +2033,1085 @@ def update_sidebar_filters(selected_tab):
             html.Label("Metric", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="statistical-metric",
-                options=[
-                    {"label": "Mean", "value": "mean"},
-                    {"label": "Median", "value": "median"},
-                    {"label": "Mode", "value": "mode"},
-                    {"label": "Standard Deviation", "value": "std"}
-                ],
+                options=[{"label": label, "value": metric} for metric, label in STATS_METRICS.items()],
                 value="mean",
                 clearable=False,
                 style=dropdown_style
             ),
+            html.Label("Group By", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="statistical-dimension",
+                options=[{"label": dimension, "value": dimension} for dimension in STATS_DIMENSIONS],
+                value=JOB_TYPE,
+                clearable=False,
+                style=dropdown_style
+            ),
             html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
             dcc.Dropdown(
                 id="statistical-request-filter",
-                options=[{"label": rt, "value": rt} for rt in sorted(df[REQUEST_TYPE].dropna().unique())],
+                options=dropdown_options(REQUEST_TYPE),
+                value=None,
+                clearable=True,
+                placeholder="Select Request Type",
+                style=dropdown_style
+            ),
+        ]
+
+    elif selected_tab == "overview":
+        return [
+            html.Label("Continent", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="overview-continent-filter",
+                options=dropdown_options(CONTINENT),
+                value=None,
+                clearable=True,
+                placeholder="Select Continent",
+                style=dropdown_style
+            ),
+            html.Label("Country", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="overview-country-filter",
+                options=dropdown_options(COUNTRY),
+                value=None,
+                clearable=True,
+                placeholder="Select Country",
+                style=dropdown_style
+            ),
+            html.Label("Request Type", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="overview-request-type-filter",
+                options=dropdown_options(REQUEST_TYPE),
                 value=None,
                 clearable=True,
                 placeholder="Select Request Type",
                 style=dropdown_style
             ),
+            html.Label("Time Granularity", style={'fontWeight': 'bold', 'marginBottom': '0.5rem'}),
+            dcc.Dropdown(
+                id="overview-granularity-filter",
+                options=[
+                    {"label": "Day", "value": "D"},
+                    {"label": "Week", "value": "W"},
+                    {"label": "Month", "value": "MS"},
+                    {"label": "Year", "value": "Y"}
+                ],
+                value="MS",
+                clearable=False,
+                style=dropdown_style
+            ),
         ]
     
     return []
 
-# Callback to update main content based on selected tab
-@app_analysis.callback(
-    Output("main-content", "children"),
-    [Input("main-tabs", "value")]
-)
+# Main content for the selected tab
+# Milliseconds between checks whether the exact figure replacing an estimate is built
+EXACT_POLL_MS = 500
+
+# A chart's graph and the poll that fetches its exact figure in approximate mode
+def chart_with_exact_poll(graph_id, poll_id):
+    return html.Div([
+        dcc.Graph(id=graph_id, style={'height': '100%'}),
+        dcc.Interval(id=poll_id, interval=EXACT_POLL_MS, disabled=True),
+    ], style={'height': '100%'})
+
 def update_main_content(selected_tab):
     if selected_tab == "geographical":
-        return dcc.Graph(id="geo-distribution-graph", style={'height': '100%'})
+        return chart_with_exact_poll("geo-distribution-graph", "geo-exact-poll")
     elif selected_tab == "gender_distribution":
-        return dcc.Graph(id="gender-distribution-graph", style={'height': '100%'})
+        return chart_with_exact_poll("gender-distribution-graph", "gender-exact-poll")
     elif selected_tab == "time_period":
-        return dcc.Graph(id="time-period-graph", style={'height': '100%'})
+        return chart_with_exact_poll("time-period-graph", "time-exact-poll")
+    elif selected_tab == "weekday_hour":
+        return dcc.Graph(id="weekday-hour-heatmap", style={'height': '100%'})
     elif selected_tab == "product":
-        return dcc.Graph(id="product-interest-map", style={'height': '100%'})
+        return chart_with_exact_poll("product-interest-map", "product-exact-poll")
     elif selected_tab == "age_distribution":
-        return dcc.Graph(id="age-distribution-graph", style={'height': '100%'})
+        return chart_with_exact_poll("age-distribution-graph", "age-exact-poll")
     elif selected_tab == "statistical_analysis":
-        return html.Div(id="statistical-analysis-output", style={
-            'padding': '2rem',
-            'fontSize': '1.2rem',
-            'textAlign': 'center',
-            'backgroundColor': '#f8f9fa',
-            'borderRadius': '8px',
-            'margin': '2rem',
-            'minHeight': '200px',
-            'display': 'flex',
-            'alignItems': 'center',
-            'justifyContent': 'center'
-        })
+        return html.Div([
+            html.Div(id="statistical-analysis-output", style={
+                'padding': '2rem',
+                'fontSize': '1.2rem',
+                'textAlign': 'center',
+                'backgroundColor': '#f8f9fa',
+                'borderRadius': '8px',
+                'margin': '2rem',
+                'minHeight': '200px',
+                'display': 'flex',
+                'alignItems': 'center',
+                'justifyContent': 'center'
+            }),
+            html.H5("Comparison Across Request Types", style={'margin': '0 2rem 1rem', 'fontWeight': 'bold'}),
+            html.Div(id="statistical-comparison-table", style={'margin': '0 2rem 2rem'}),
+            html.H5("Missing Values", style={'margin': '0 2rem 1rem', 'fontWeight': 'bold'}),
+            html.Div(missing_value_component(), id="statistical-missing-table", style={'margin': '0 2rem 2rem'})
+        ])
+    elif selected_tab == "overview":
+        return dcc.Graph(id="overview-graph", style={'height': '100%'})
     
     return html.Div("Select a tab to view content")
 
+# UI data shipped once with the page: the filter and content components of
+# every tab plus the country hierarchy. Tab switches and continent changes
+# are then handled by clientside callbacks without a server round trip.
+def component_json(component):
+    return json.loads(json.dumps(component, cls=PlotlyJSONEncoder))
+
+def build_ui_data():
+    tab_values = [tab.value for tab in tabs.children]
+    return {
+        "filters": {
+            tab: component_json(update_sidebar_filters(tab) + cross_filter_controls(TAB_FILTERS[tab][0]))
+            for tab in tab_values
+        },
+        "filter_ids": {tab: filter_ids for tab, (_, filter_ids) in TAB_FILTERS.items()},
+        "content": {tab: component_json(update_main_content(tab)) for tab in tab_values},
+        "no_content": component_json(update_main_content(None)),
+        "countries": dropdown_options(COUNTRY),
+        "countries_by_continent": DIMENSIONS["countries_by_continent"],
+        "continent_of_country": {
+            option["value"]: continent
+            for continent, options in DIMENSIONS["countries_by_continent"].items() for option in options
+        },
+    }
+
+UI_DATA = build_ui_data()
+app_analysis.layout = serve_layout
+
+# Update sidebar filters based on selected tab
+app_analysis.clientside_callback(
+    """
+    function(selectedTab, ui, filters) {
+        // Dropdowns start from the shared filter state
+        var children = JSON.parse(JSON.stringify(ui.filters[selectedTab] || []));
+        var filterIds = ui.filter_ids[selectedTab] || {};
+        children.forEach(function(child) {
+            var key = child.props && filterIds[child.props.id];
+            if (key) {
+                child.props.value = filters[key] || null;
+            }
+        });
+        return children;
+    }
+    """,
+    Output("dynamic-filters", "children"),
+    Input("main-tabs", "value"),
+    State("ui-store", "data"),
+    State("filter-store", "data")
+)
+
+# Update main content based on selected tab
+app_analysis.clientside_callback(
+    """
+    function(selectedTab, ui) {
+        return ui.content[selectedTab] || ui.no_content;
+    }
+    """,
+    Output("main-content", "children"),
+    Input("main-tabs", "value"),
+    State("ui-store", "data")
+)
+
+# Country dropdown depends on continent (every tab with a Country filter except Geography)
+COUNTRY_OPTIONS_JS = """
+function(selectedContinent, ui) {
+    if (!selectedContinent) {
+        return ui.countries;
+    }
+    return ui.countries_by_continent[selectedContinent] || [];
+}
+"""
+
+for tab_prefix in ["product", "time", "heatmap", "gender", "age", "overview"]:
+    app_analysis.clientside_callback(
+        COUNTRY_OPTIONS_JS,
+        Output(f"{tab_prefix}-country-filter", "options"),
+        Input(f"{tab_prefix}-continent-filter", "value"),
+        State("ui-store", "data")
+    )
+
+# A tab's dropdowns, graph clicks and clear button update the shared filter
+# state; the dropdowns are outputs too, so a map click or a clear shows in them.
+# Clicking the selected value again removes the filter.
+FILTER_WRITER_JS = """
+function() {
+    var config = __CONFIG__;
+    var args = Array.prototype.slice.call(arguments);
+    var ui = args.pop();
+    var filters = Object.assign({}, args.pop());
+    var values = args.slice(0, config.keys.length);
+    var clickData = args[config.keys.length];
+    var triggered = dash_clientside.callback_context.triggered.map(function(t) { return t.prop_id; });
+    var fired = function(suffix) {
+        return triggered.some(function(id) { return id.slice(-suffix.length) === suffix; });
+    };
+
+    if (fired("-clear-filters.n_clicks")) {
+        Object.keys(filters).forEach(function(key) { filters[key] = null; });
+    } else if (config.click && fired(".clickData")) {
+        if (!clickData || !clickData.points.length) {
+            return dash_clientside.no_update;
+        }
+        var key = config.click[0];
+        var value = clickData.points[0][config.click[1]];
+        value = Array.isArray(value) ? value[0] : value;
+        filters[key] = filters[key] === value ? null : value;
+        if (key === config.country && filters[key]) {
+            filters[config.continent] = ui.continent_of_country[value] || filters[config.continent];
+        }
+    } else {
+        config.keys.forEach(function(key, i) { filters[key] = values[i] || null; });
+    }
+    return [filters].concat(config.keys.map(function(key) { return filters[key]; }));
+}
+"""
+
+ACTIVE_FILTERS_JS = """
+function(filters) {
+    var active = Object.keys(filters || {}).filter(function(key) { return filters[key]; });
+    if (!active.length) {
+        return "No filters applied";
+    }
+    return "Filtered by " + active.map(function(key) { return key + ": " + filters[key]; }).join(", ");
+}
+"""
+
+# /api/export of the rows matching the filter state
+EXPORT_LINK_JS = """
+function(filters) {
+    var params = __PARAMS__;
+    var query = Object.keys(params).filter(function(name) { return filters && filters[params[name]]; })
+        .map(function(name) { return name + "=" + encodeURIComponent(filters[params[name]]); });
+    return "/api/export" + (query.length ? "?" + query.join("&") : "");
+}
+""".replace("__PARAMS__", json.dumps(API_FILTERS))
+
+for tab, (tab_prefix, filter_ids) in TAB_FILTERS.items():
+    click = CLICK_FILTERS.get(tab)
+    config = {
+        "keys": list(filter_ids.values()),
+        "click": [click[1], click[2]] if click else None,
+        "country": COUNTRY,
+        "continent": CONTINENT,
+    }
+    inputs = [Input(filter_id, "value") for filter_id in filter_ids]
+    if click:
+        inputs.append(Input(click[0], "clickData"))
+    app_analysis.clientside_callback(
+        FILTER_WRITER_JS.replace("__CONFIG__", json.dumps(config)),
+        [Output("filter-store", "data", allow_duplicate=True)] + [Output(filter_id, "value") for filter_id in filter_ids],
+        inputs + [Input(f"{tab_prefix}-clear-filters", "n_clicks")],
+        State("filter-store", "data"),
+        State("ui-store", "data"),
+        prevent_initial_call=True
+    )
+    app_analysis.clientside_callback(
+        ACTIVE_FILTERS_JS,
+        Output(f"{tab_prefix}-active-filters", "children"),
+        Input("filter-store", "data")
+    )
+    app_analysis.clientside_callback(
+        EXPORT_LINK_JS,
+        Output(f"{tab_prefix}-export-link", "href"),
+        Input("filter-store", "data")
+    )
+
+# A chart's store follows the filter state only when one of its filters changes
+CHART_FILTERS_JS = """
+function(filters, current) {
+    var keys = __KEYS__;
+    var selected = {};
+    keys.forEach(function(key) { selected[key] = (filters || {})[key] || null; });
+    if (current && JSON.stringify(current) === JSON.stringify(selected)) {
+        return dash_clientside.no_update;
+    }
+    return selected;
+}
+"""
+
+for store_id, chart_filters in CHART_FILTERS.items():
+    app_analysis.clientside_callback(
+        CHART_FILTERS_JS.replace("__KEYS__", json.dumps(chart_filters)),
+        Output(store_id, "data"),
+        Input("filter-store", "data"),
+        State(store_id, "data")
+    )
+
+# Incremental ingestion
+# Rows appended to Ona.csv and CSV files dropped into DELTA_DIR are parsed as
+# they arrive - only the new bytes and files - and folded into the dataset,
+# the cubes, the filter index and the dimension registry without a reload.
+# Each worker ingests on its own, so delta files are never moved or deleted;
+# they are picked up again after a restart. Write them under another name
+# and rename them to *.csv once complete.
+INGEST_STATE = {"offset": DATA_SOURCE["size"], "deltas": set(), "base_version": DATA_VERSION}
+if QUERY_BACKEND in STORE_BACKENDS:
+    INGEST_STATE.update(offset=STORE_MANIFEST["offset"], deltas=set(STORE_MANIFEST["deltas"]))
+ingest_lock = threading.Lock()
+
+# Complete lines appended to the CSV since the last check, or None if the
+# file shrank and has to be reloaded
+def read_csv_tail(path):
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < INGEST_STATE["offset"]:
+            return None
+        f.seek(INGEST_STATE["offset"])
+        data = f.read(size - INGEST_STATE["offset"])
+    return data[:data.rfind(b"\n") + 1]
+
+# Names and parsed rows of the delta files not ingested yet
+def read_new_deltas():
+    names, frames = [], []
+    if not DELTA_DIR or not os.path.isdir(DELTA_DIR):
+        return names, frames
+    for name in sorted(os.listdir(DELTA_DIR)):
+        if name.endswith(".csv") and name not in INGEST_STATE["deltas"]:
+            frames.append(read_ona_csv(os.path.join(DELTA_DIR, name)))
+            names.append(name)
+    return names, frames
+
+def compact_rows(frame):
+    return compact_frame(frame) if COMPACT_DATA else frame
+
+# df stays the loaded frame; ingested rows live in the filter index's delta segments
+def install_dataset(frame, filter_index, cubes):
+    global df, FILTER_INDEX, CUBES, DIMENSIONS, UI_DATA, DATA_VERSION
+    df, FILTER_INDEX, CUBES = frame, filter_index, cubes
+    DIMENSIONS = build_dimensions(filter_index, cubes)
+    UI_DATA = build_ui_data()
+    # Last, so a figure cached under the new version was built from the new cubes
+    DATA_VERSION = f"{INGEST_STATE['base_version']}-{filter_index['rows']}"
+
+# Ona.csv was rewritten: start over from the file and every delta
+def reload_dataset():
+    frame, source = load_dataset(DATA_PATH)
+    INGEST_STATE.update(offset=source["size"], deltas=set(), base_version=source["sha256"][:16])
+    filter_index, cubes = build_filter_index(frame, FILTER_COLUMNS), build_cubes(frame)
+    names, delta_frames = read_new_deltas()
+    if delta_frames:
+        new_rows = compact_rows(pd.concat(delta_frames, ignore_index=True))
+        filter_index, cubes = extend_filter_index(filter_index, new_rows), merge_cubes(cubes, build_cubes(new_rows))
+    INGEST_STATE["deltas"].update(names)
+    install_dataset(frame, filter_index, cubes)
+    print(f"{DATA_PATH} was rewritten; reloaded {filter_index['rows']} rows")
+    return filter_index["rows"]
+
+def install_sqlite_store(manifest):
+    global SQLITE_STATE, DIMENSIONS, UI_DATA, DATA_VERSION
+    SQLITE_STATE = sqlite_state(manifest)
+    DIMENSIONS = SQLITE_STATE["dimensions"]
+    UI_DATA = build_ui_data()
+    DATA_VERSION = f"{manifest['source']['sha256'][:16]}-{manifest['rows']}"
+
+# The store is shared, so the offset and delta files already ingested are read
+# from its manifest inside the write transaction: the first worker to see new
+# rows inserts them, the others only pick up the new manifest
+def ingest_sqlite_rows():
+    with ingest_lock:
+        con = sqlite3.connect(SQLITE_PATH, timeout=60, isolation_level=None)
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            manifest = read_store_manifest(con)
+            INGEST_STATE.update(offset=manifest["offset"], deltas=set(manifest["deltas"]))
+            tail = read_csv_tail(DATA_PATH)
+            if tail is not None:
+                names, new_parts = read_new_deltas()
+                if tail:
+                    new_parts.insert(0, read_ona_csv(io.BytesIO(tail), header=False))
+                if new_parts:
+                    for part in new_parts:
+                        add_store_rows(con, manifest, part)
+                    manifest["offset"] += len(tail)
+                    manifest["deltas"] += names
+                    manifest["mtime_ns"] = file_fingerprint(DATA_PATH)["mtime_ns"]
+                    write_store_manifest(con, manifest)
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+        if tail is None:
+            # Ona.csv was rewritten; delta files are folded in on the next check
+            manifest = build_sqlite_store(DATA_PATH)
+            INGEST_STATE.update(offset=manifest["offset"], deltas=set())
+            install_sqlite_store(manifest)
+            print(f"{DATA_PATH} was rewritten; reloaded {manifest['rows']} rows")
+            return manifest["rows"]
+
+        INGEST_STATE.update(offset=manifest["offset"], deltas=set(manifest["deltas"]))
+        new_rows = manifest["rows"] - SQLITE_STATE["rows"]
+        if new_rows or manifest["source"]["sha256"] != SQLITE_STATE["sha256"]:
+            install_sqlite_store(manifest)
+            print(f"Ingested {new_rows} new rows ({manifest['rows']} total)")
+        return new_rows
+
+def install_partition_store(manifest):
+    global PARTITION_STATE, DIMENSIONS, UI_DATA, DATA_VERSION
+    PARTITION_STATE = partition_state(manifest)
+    DIMENSIONS = PARTITION_STATE["dimensions"]
+    UI_DATA = build_ui_data()
+    DATA_VERSION = f"{manifest['source']['sha256'][:16]}-{manifest['rows']}"
+
+# Like ingest_sqlite_rows, with a lock file serializing the workers' appends
+def ingest_partition_rows():
+    with ingest_lock, open(os.path.join(PARTITION_DIR, "ingest.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = read_partition_manifest()
+        INGEST_STATE.update(offset=manifest["offset"], deltas=set(manifest["deltas"]))
+        tail = read_csv_tail(DATA_PATH)
+        if tail is None:
+            # Ona.csv was rewritten; delta files are folded in on the next check
+            manifest = build_partition_store(DATA_PATH)
+            INGEST_STATE.update(offset=manifest["offset"], deltas=set())
+            install_partition_store(manifest)
+            print(f"{DATA_PATH} was rewritten; reloaded {manifest['rows']} rows")
+            return manifest["rows"]
+
+        names, new_parts = read_new_deltas()
+        if tail:
+            new_parts.insert(0, read_ona_csv(io.BytesIO(tail), header=False))
+        if new_parts:
+            data_dir = os.path.join(PARTITION_DIR, manifest["data"])
+            for part in new_parts:
+                add_partition_rows(data_dir, manifest, part)
+            manifest["offset"] += len(tail)
+            manifest["deltas"] += names
+            manifest["mtime_ns"] = file_fingerprint(DATA_PATH)["mtime_ns"]
+            write_partition_manifest(manifest)
+
+    INGEST_STATE.update(offset=manifest["offset"], deltas=set(manifest["deltas"]))
+    new_rows = manifest["rows"] - PARTITION_STATE["rows"]
+    if new_rows or os.path.join(PARTITION_DIR, manifest["data"]) != PARTITION_STATE["data_dir"]:
+        install_partition_store(manifest)
+        print(f"Ingested {new_rows} new rows ({manifest['rows']} total)")
+    return new_rows
+
+def ingest_new_rows():
+    if QUERY_BACKEND == "sqlite":
+        return ingest_sqlite_rows()
+    if QUERY_BACKEND == "partitioned":
+        return ingest_partition_rows()
+    with ingest_lock:
+        tail = read_csv_tail(DATA_PATH)
+        if tail is None:
+            return reload_dataset()
+
+        names, new_parts = read_new_deltas()
+        if tail:
+            new_parts.insert(0, read_ona_csv(io.BytesIO(tail), header=False))
+        if not new_parts:
+            return 0
+
+        new_rows = compact_rows(pd.concat(new_parts, ignore_index=True))
+        filter_index = extend_filter_index(FILTER_INDEX, new_rows)
+        install_dataset(df, filter_index, merge_cubes(CUBES, build_cubes(new_rows)))
+        INGEST_STATE["offset"] += len(tail)
+        INGEST_STATE["deltas"].update(names)
+        print(f"Ingested {len(new_rows)} new rows ({filter_index['rows']} total)")
+        return len(new_rows)
+
+def ingest_periodically():
+    while True:
+        time.sleep(INGEST_INTERVAL)
+        try:
+            ingest_new_rows()
+        except Exception as e:
+            print(f"Ingestion failed: {e}")
+
+# Started on the first request, so each forked gunicorn worker runs its own
+ingest_thread = None
+
+@server.before_request
+def start_ingestion():
+    global ingest_thread
+    if INGEST_INTERVAL <= 0 or ingest_thread is not None:
+        return
+    with ingest_lock:
+        if ingest_thread is None:
+            ingest_thread = threading.Thread(target=ingest_periodically, daemon=True)
+            ingest_thread.start()
+
+# Fold in delta files that are already waiting
+if DELTA_DIR:
+    ingest_new_rows()
+
+# Callback instrumentation
+# Every server-side callback records its latency, the rows it scanned and
+# matched, the cube cells it read, its figure cache outcome and the size of
+# its response. /metrics serves them per worker in the Prometheus text format.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+callback_metrics = {}
+metrics_lock = threading.Lock()
+
+# Counters and name of the callback running in this context. Figure builds
+# run on the pool in a copy of the caller's context with counters of their
+# own, added to the caller's metrics when the build ends: a build can outlive
+# the callback that started it (see Approximate mode).
+callback_scan = contextvars.ContextVar("callback_scan", default=None)
+callback_name = contextvars.ContextVar("callback_name", default=None)
+
+# Threads currently running a callback or a figure build, for the profiler
+busy_threads = set()
+
+def record_scan(**counts):
+    scan = callback_scan.get()
+    if scan is not None:
+        for name, value in counts.items():
+            scan[name] = scan.get(name, 0) + int(value)
+
+def peak_rss_bytes():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def callback_entry(name):
+    entry = callback_metrics.get(name)
+    if entry is None:
+        entry = callback_metrics[name] = {
+            "buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "seconds": 0.0, "errors": 0,
+            "response_count": 0, "response_bytes": 0, "counters": collections.Counter(),
+        }
+    return entry
+
+def record_callback(name, elapsed, failed, scan):
+    with metrics_lock:
+        entry = callback_entry(name)
+        entry["count"] += 1
+        entry["seconds"] += elapsed
+        entry["errors"] += failed
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                entry["buckets"][i] += 1
+        entry["counters"].update(scan)
+
+def instrumented(func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        scan = {}
+        token = callback_scan.set(scan)
+        name_token = callback_name.set(func.__name__)
+        busy_threads.add(threading.get_ident())
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            busy_threads.discard(threading.get_ident())
+            callback_scan.reset(token)
+            callback_name.reset(name_token)
+            scan["peak_rss_increase_bytes"] = peak_rss_bytes() - peak_before
+            record_callback(func.__name__, elapsed, failed, scan)
+            # The response size is known once Dash has serialized the output
+            if flask.has_request_context():
+                flask.g.callback_name = func.__name__
+    return wrapper
+
+# Instruments a streamed response under name: the latency is that of the
+# whole stream and the scans are those its chunks made while being produced.
+# Each chunk is produced in a context of the stream's own, as the request's
+# context has moved on by then.
+def instrumented_stream(name, chunks):
+    scan, sent = {}, 0
+    context = contextvars.copy_context()
+    context.run(callback_scan.set, scan)
+    context.run(callback_name.set, name)
+    start = time.perf_counter()
+    failed = True
+    try:
+        while True:
+            try:
+                chunk = context.run(next, chunks)
+            except StopIteration:
+                break
+            sent += len(chunk)
+            yield chunk
+        failed = False
+    finally:
+        record_callback(name, time.perf_counter() - start, failed, scan)
+        with metrics_lock:
+            entry = callback_entry(name)
+            entry["response_count"] += 1
+            entry["response_bytes"] += sent
+
+@server.after_request
+def record_response_size(response):
+    name = flask.g.get("callback_name")
+    if name and response.content_length is not None:
+        with metrics_lock:
+            entry = callback_entry(name)
+            entry["response_count"] += 1
+            entry["response_bytes"] += response.content_length
+    return response
+
+# Scan counters exported as ona_callback_<name>_total
+SCAN_COUNTERS = {
+    "rows_scanned": "Rows scanned row by row (filter index)",
+    "rows_matched": "Rows left after filtering",
+    "cube_cells": "Cells read from the count cubes",
+    "partitions_scanned": "Partitions of the partitioned store read",
+    "partitions_skipped": "Partitions of the partitioned store skipped by their statistics",
+    "peak_rss_increase_bytes": "Growth of the worker's peak RSS while the callback ran",
+}
+FIGURE_CACHE_RESULTS = ["hit", "disk_hit", "miss", "coalesced"]
+
+def prometheus_text():
+    with metrics_lock:
+        snapshot = {name: dict(entry, buckets=list(entry["buckets"]), counters=collections.Counter(entry["counters"]))
+                    for name, entry in callback_metrics.items()}
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    family("ona_callback_duration_seconds", "histogram", "Dash callback latency")
+    for name, entry in sorted(snapshot.items()):
+        for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+            lines.append(f'ona_callback_duration_seconds_bucket{{callback="{name}",le="{bound}"}} {count}')
+        lines.append(f'ona_callback_duration_seconds_bucket{{callback="{name}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'ona_callback_duration_seconds_sum{{callback="{name}"}} {entry["seconds"]:.6f}')
+        lines.append(f'ona_callback_duration_seconds_count{{callback="{name}"}} {entry["count"]}')
+
+    family("ona_callback_errors_total", "counter", "Dash callbacks that raised")
+    for name, entry in sorted(snapshot.items()):
+        lines.append(f'ona_callback_errors_total{{callback="{name}"}} {entry["errors"]}')
+
+    for counter, help_text in SCAN_COUNTERS.items():
+        family(f"ona_callback_{counter}_total", "counter", help_text)
+        for name, entry in sorted(snapshot.items()):
+            lines.append(f'ona_callback_{counter}_total{{callback="{name}"}} {entry["counters"][counter]}')
+
+    family("ona_callback_figure_cache_total", "counter", "Figure cache outcomes")
+    for name, entry in sorted(snapshot.items()):
+        for result in FIGURE_CACHE_RESULTS:
+            count = entry["counters"]["cache_" + result]
+            if count:
+                lines.append(f'ona_callback_figure_cache_total{{callback="{name}",result="{result}"}} {count}')
+
+    family("ona_callback_response_bytes", "summary", "Size of the callback responses sent to the browser")
+    for name, entry in sorted(snapshot.items()):
+        lines.append(f'ona_callback_response_bytes_sum{{callback="{name}"}} {entry["response_bytes"]}')
+        lines.append(f'ona_callback_response_bytes_count{{callback="{name}"}} {entry["response_count"]}')
+
+    family("ona_process_resident_memory_bytes", "gauge", "Resident memory of this worker")
+    rss = current_rss_bytes()
+    if rss is not None:
+        lines.append(f"ona_process_resident_memory_bytes {rss}")
+    family("ona_process_peak_resident_memory_bytes", "gauge", "Peak resident memory of this worker")
+    lines.append(f"ona_process_peak_resident_memory_bytes {peak_rss_bytes()}")
+    family("ona_dataset_rows", "gauge", "Rows in the loaded dataset")
+    lines.append(f"ona_dataset_rows {QUERY['rows']()}")
+    family("ona_figure_cache_entries", "gauge", "Figures in this worker's cache")
+    lines.append(f"ona_figure_cache_entries {len(figure_cache)}")
+    return "\n".join(lines) + "\n"
+
+@server.route("/metrics")
+def metrics():
+    return flask.Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+# Sampling profiler
+# With ONA_PROFILE_INTERVAL set, a thread samples the stacks of the threads
+# that are running a callback or figure build; /profile returns the counts as
+# collapsed stacks (flamegraph.pl / speedscope input), ?reset=1 clears them.
+profile_samples = collections.Counter()
+profiler_thread = None
+
+def sample_stacks():
+    while True:
+        time.sleep(PROFILE_INTERVAL)
+        frames = sys._current_frames()
+        stacks = []
+        for ident in list(busy_threads):
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                stacks.append(";".join(reversed(stack)))
+        with metrics_lock:
+            profile_samples.update(stacks)
+
+@server.before_request
+def start_profiler():
+    global profiler_thread
+    if PROFILE_INTERVAL <= 0 or profiler_thread is not None:
+        return
+    with metrics_lock:
+        if profiler_thread is None:
+            profiler_thread = threading.Thread(target=sample_stacks, daemon=True)
+            profiler_thread.start()
+
+@server.route("/profile")
+def profile():
+    if PROFILE_INTERVAL <= 0:
+        return flask.Response("Profiler disabled; set ONA_PROFILE_INTERVAL\n", status=404, mimetype="text/plain")
+    with metrics_lock:
+        samples = profile_samples.most_common()
+        if flask.request.args.get("reset"):
+            profile_samples.clear()
+    text = "".join(f"{stack} {count}\n" for stack, count in samples)
+    return flask.Response(text, mimetype="text/plain")
+
+# Figure cache
+# Figures are memoized per (callback, normalized filter values, dataset
+# version): an in-process LRU with a TTL, backed by FIGURE_CACHE_DIR when set
+# so workers share each other's figures. The dataset version changes with
+# Ona.csv, so figures of an older CSV are never served.
+figure_cache = collections.OrderedDict()
+figure_cache_lock = threading.Lock()
+FIGURE_CACHE_STATS = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+# Cache misses are built on a bounded pool shared by all request threads of
+# the worker, so a burst of requests cannot run more than FIGURE_BUILD_THREADS
+# aggregations at once. A figure that is already being built is awaited
+# instead of built again. The pool starts its threads on first use, i.e. in
+# the gunicorn workers rather than the preloading master.
+figure_pool = concurrent.futures.ThreadPoolExecutor(max_workers=FIGURE_BUILD_THREADS, thread_name_prefix="figure-build")
+figures_in_flight = {}
+# The error of each key's last failed build, newest last, up to
+# FIGURE_CACHE_SIZE of them; a successful build of the key clears it
+failed_figures = collections.OrderedDict()
+
+# Empty dropdown values all mean "no filter"
+def normalize_filter_value(value):
+    if isinstance(value, (list, tuple)):
+        return sorted(value) or None
+    return value or None
+
+# FIGURE_CACHE_DIR holds one figures-<dataset version> directory per version
+FIGURE_DIR_PREFIX = "figures-"
+
+def figure_cache_path(key):
+    name = hashlib.sha1(key.encode()).hexdigest() + ".json"
+    return os.path.join(FIGURE_CACHE_DIR, FIGURE_DIR_PREFIX + DATA_VERSION, name)
+
+def read_disk_figure(key):
+    path = figure_cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > FIGURE_CACHE_TTL:
+            os.remove(path)
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_disk_figure(key, fig):
+    version_dir = os.path.dirname(figure_cache_path(key))
+    try:
+        if not os.path.isdir(version_dir):
+            # First figure of a new dataset version: drop the version
+            # directories nothing was written to for FIGURE_CACHE_TTL. Their
+            # figures have all expired, while versions other workers are still
+            # on (older or newer) keep being written to. Anything else in the
+            # directory is left alone.
+            if os.path.isdir(FIGURE_CACHE_DIR):
+                now = time.time()
+                for name in os.listdir(FIGURE_CACHE_DIR):
+                    path = os.path.join(FIGURE_CACHE_DIR, name)
+                    if name.startswith(FIGURE_DIR_PREFIX) and os.path.isdir(path) and now - os.path.getmtime(path) > FIGURE_CACHE_TTL:
+                        shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(version_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=version_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(fig.to_json())
+        os.replace(tmp_path, figure_cache_path(key))
+
+        # Keep the directory to FIGURE_CACHE_SIZE entries, oldest first out
+        entries = [os.path.join(version_dir, name) for name in os.listdir(version_dir) if name.endswith(".json")]
+        if len(entries) > FIGURE_CACHE_SIZE:
+            entries.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for path in entries[:len(entries) - FIGURE_CACHE_SIZE]:
+                os.remove(path)
+    except OSError:
+        pass
+
+def remember_figure(key, fig):
+    with figure_cache_lock:
+        figure_cache[key] = (time.monotonic(), fig)
+        figure_cache.move_to_end(key)
+        while len(figure_cache) > FIGURE_CACHE_SIZE:
+            figure_cache.popitem(last=False)
+
+# Runs on figure_pool: the shared disk cache first, then the callback itself
+def load_or_build_figure(key, func, args):
+    scan = {}
+    callback_scan.set(scan)
+    busy_threads.add(threading.get_ident())
+    try:
+        fig = read_disk_figure(key) if FIGURE_CACHE_DIR else None
+        if fig is not None:
+            record_scan(cache_disk_hit=1)
+            with figure_cache_lock:
+                FIGURE_CACHE_STATS["disk_hits"] += 1
+        else:
+            record_scan(cache_miss=1)
+            with figure_cache_lock:
+                FIGURE_CACHE_STATS["misses"] += 1
+            fig = func(*args)
+            if FIGURE_CACHE_DIR:
+                write_disk_figure(key, fig)
+        remember_figure(key, fig)
+        return fig
+    except Exception as e:
+        with figure_cache_lock:
+            failed_figures[key] = e
+            failed_figures.move_to_end(key)
+            while len(failed_figures) > FIGURE_CACHE_SIZE:
+                failed_figures.popitem(last=False)
+        raise
+    finally:
+        busy_threads.discard(threading.get_ident())
+        if callback_name.get() is not None:
+            with metrics_lock:
+                callback_entry(callback_name.get())["counters"].update(scan)
+        with figure_cache_lock:
+            figures_in_flight.pop(key, None)
+
+# (figure, None) when the figure under key is cached, otherwise (None, the
+# future of its build), starting the build unless another request already did.
+# With retry=False a key whose last build failed raises that error instead
+# of being built again.
+def cached_or_building(key, func, args, retry=True):
+    now = time.monotonic()
+    with figure_cache_lock:
+        entry = figure_cache.get(key)
+        if entry is not None and now - entry[0] <= FIGURE_CACHE_TTL:
+            figure_cache.move_to_end(key)
+            FIGURE_CACHE_STATS["hits"] += 1
+            record_scan(cache_hit=1)
+            return entry[1], None
+
+        future = figures_in_flight.get(key)
+        if future is None and not retry and key in failed_figures:
+            raise failed_figures[key]
+        if future is None:
+            failed_figures.pop(key, None)
+            future = figure_pool.submit(contextvars.copy_context().run, load_or_build_figure, key, func, args)
+            figures_in_flight[key] = future
+        else:
+            FIGURE_CACHE_STATS["coalesced"] += 1
+            record_scan(cache_coalesced=1)
+    return None, future
+
+def cached_figure(func):
+    def cache_key(args):
+        return json.dumps([func.__name__, DATA_VERSION, [normalize_filter_value(a) for a in args]])
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        fig, future = cached_or_building(cache_key(args), func, args)
+        return fig if future is None else future.result()
+
+    # The figure if it is cached or already built, otherwise None while the
+    # build goes on in the background (see Approximate mode). Polls pass
+    # retry=False, so a failed build raises rather than being started on
+    # every poll; a figure evicted or expired since its build is rebuilt.
+    def if_ready(*args, retry=True):
+        fig, future = cached_or_building(cache_key(args), func, args, retry)
+        if future is None:
+            return fig
+        return future.result() if future.done() else None
+
+    wrapper.if_ready = if_ready
+    return wrapper
+
+# Hit/miss counters of this worker's figure cache
+@server.route("/figure-cache")
+def figure_cache_stats():
+    with figure_cache_lock:
+        stats = dict(FIGURE_CACHE_STATS, entries=len(figure_cache), in_flight=len(figures_in_flight))
+    return dict(stats, dataset_version=DATA_VERSION)
+
+# Once a chart is on the page, a filter change only moves its trace data:
+# send those arrays as a Patch instead of the whole figure (layout, template,
+# colour scales). The first render, direct calls and charts without
+# trace_props (whose layout follows the data) get the full figure.
+def figure_or_patch(fig, trace_props):
+    if not trace_props or not flask.has_request_context() or ctx.triggered_id is None:
+        return fig
+    traces = fig["data"] if isinstance(fig, dict) else [trace.to_plotly_json() for trace in fig.data]
+    patch = Patch()
+    for i, trace in enumerate(traces):
+        for prop in trace_props:
+            patch["data"][i][prop] = trace.get(prop)
+    return patch
+
+# Approximate mode
+# A stratified sample of the dataset: up to SAMPLE_PER_STRATUM rows of every
+# (Continent, Country, Request Type) stratum, drawn uniformly at random in one
+# streamed pass over QUERY["export"], plus the row count of every stratum.
+# Continent, Country and Request Type filters select whole strata; counts per
+# value of the charted column under the other filters are estimated in each
+# stratum and scaled up by its size, with 95% confidence bounds from the
+# per-stratum variance. Each worker draws its sample in a background thread
+# and redraws it once the dataset has grown by more than 1%.
+SAMPLE_STRATA = [CONTINENT, COUNTRY, REQUEST_TYPE]
+SAMPLE_COLUMNS = SAMPLE_STRATA + [GENDER, AGE_GROUP, PLATFORM, DATE]
+SAMPLE_CHECK_SECONDS = 60
+# Hover and error bar column of estimated counts
+MARGIN = "± 95% CI"
+SAMPLE = None
+sample_thread = None
+
+def draw_sample():
+    global SAMPLE
+    rng = np.random.default_rng()
+    kept, sizes = None, None
+    for chunk in QUERY["export"]({}):
+        chunk = chunk[SAMPLE_COLUMNS].assign(**{col: chunk[col].fillna("") for col in SAMPLE_STRATA})
+        # The rows with the smallest random keys of a stratum are a uniform
+        # sample of it, however the chunks split it
+        chunk["key"] = rng.random(len(chunk))
+        counts = chunk.groupby(SAMPLE_STRATA).size()
+        sizes = counts if sizes is None else sizes.add(counts, fill_value=0)
+        kept = chunk if kept is None else pd.concat([kept, chunk], ignore_index=True)
+        kept = kept.sort_values("key").groupby(SAMPLE_STRATA, sort=False).head(SAMPLE_PER_STRATUM)
+    if kept is None:
+        return
+
+    strata = sizes.astype(np.int64).rename("rows").reset_index()
+    stratum = pd.MultiIndex.from_frame(strata[SAMPLE_STRATA]).get_indexer(pd.MultiIndex.from_frame(kept[SAMPLE_STRATA]))
+    strata["sampled"] = np.bincount(stratum, minlength=len(strata))
+    frame = kept[SAMPLE_COLUMNS].astype({col: "category" for col in SAMPLE_COLUMNS if col != DATE})
+    frame = frame.assign(stratum=stratum).reset_index(drop=True)
+    SAMPLE = {"frame": frame, "strata": strata, "rows": int(strata["rows"].sum())}
+    print(f"Approximate mode: sampled {len(frame)} of {SAMPLE['rows']} rows in {len(strata)} strata")
+
+def sample_periodically():
+    while True:
+        rows = QUERY["rows"]()
+        if SAMPLE is None or abs(rows - SAMPLE["rows"]) > rows / 100:
+            try:
+                draw_sample()
+            except Exception as e:
+                print(f"Sampling failed: {e}")
+        time.sleep(SAMPLE_CHECK_SECONDS)
+
+# Started on the first request, like ingestion, so each worker samples its own
+@server.before_request
+def start_sampling():
+    global sample_thread
+    if not APPROXIMATE or sample_thread is not None:
+        return
+    with ingest_lock:
+        if sample_thread is None:
+            sample_thread = threading.Thread(target=sample_periodically, daemon=True)
+            sample_thread.start()
+
+# Estimated counts per value of col, or per time bucket of granularity, and
+# the half-widths of their 95% confidence intervals
+def sample_estimate(col, continent=None, country=None, request=None, cross=None, granularity=None):
+    sample = SAMPLE
+    strata, frame = sample["strata"], sample["frame"]
+    selected = np.ones(len(strata), dtype=bool)
+    for strata_col, value in ((CONTINENT, continent), (COUNTRY, country), (REQUEST_TYPE, request)):
+        if value:
+            selected &= (strata[strata_col] == value).to_numpy()
+    rows = selected[frame["stratum"].to_numpy()]
+    for cross_col, value in cross or ():
+        rows &= (frame[cross_col] == value).to_numpy()
+
+    by = pd.Grouper(key=DATE, freq=TIME_GRANULARITIES[granularity]) if granularity else col
+    counts = frame[rows].groupby(["stratum", by], observed=True).size().unstack(fill_value=0)
+    if counts.empty:
+        return pd.Series(dtype="float64"), pd.Series(dtype="float64")
+
+    # Per stratum h: N_h * p_hv estimates its count, with variance
+    # N_h^2 * (1 - n_h / N_h) * p_hv * (1 - p_hv) / (n_h - 1)
+    n = strata["sampled"].to_numpy(dtype=float)[counts.index, None]
+    N = strata["rows"].to_numpy(dtype=float)[counts.index, None]
+    p = counts.to_numpy() / n
+    estimate = (N * p).sum(axis=0)
+    variance = (N ** 2 * (1 - n / N) * p * (1 - p) / np.maximum(n - 1, 1)).sum(axis=0)
+    labels = list(counts.columns)
+    return pd.Series(estimate, index=labels).round(), pd.Series(1.96 * np.sqrt(variance), index=labels).round()
+
+# Titles an estimated figure as such and notes the sample behind it
+def mark_estimate(fig, status="exact counts are loading"):
+    fig.update_layout(title_text=f"{fig.layout.title.text} (estimate)")
+    fig.add_annotation(
+        text=f"Estimated from {len(SAMPLE['frame']):,} sampled rows with 95% confidence bounds; {status}",
+        xref="paper", yref="paper", x=0.5, y=1.0, yanchor="bottom", showarrow=False, font=dict(size=11, color="gray")
+    )
+    return fig
+
+# Outputs of a chart callback: its figure and whether its exact-figure poll is
+# off. In approximate mode the exact figure is returned once it is built;
+# until then the estimate is, with the exact build left running and the poll
+# on. A poll while the build still runs leaves the estimate in place. If the
+# build fails the estimate stays, marked as final, and the poll stops, since
+# every poll would start the failing build again; the next filter change
+# retries it.
+def approximate_or_exact(builder, estimate, args, trace_props):
+    if not APPROXIMATE or SAMPLE is None:
+        return figure_or_patch(builder(*args), trace_props), True
+    polled = flask.has_request_context() and str(ctx.triggered_id).endswith("-exact-poll")
+    try:
+        fig = builder.if_ready(*args, retry=not polled)
+    except Exception as e:
+        print(f"Exact figure of {builder.__name__}{args} failed: {e}")
+        return mark_estimate(estimate(*args), "exact counts are unavailable"), True
+    if fig is not None:
+        return fig, True
+    if polled:
+        return dash.no_update, False
+    return mark_estimate(estimate(*args)), False
+
 # All your existing callbacks remain the same
+# Charts read their derived filter store (see CHART_FILTERS); the figure builders
+# take the continent, country and request type plus the cross-filters
 @app_analysis.callback(
     Output("geo-distribution-graph", "figure"),
-    [
-        Input("geo-continent-filter", "value"),
-        Input("geo-country-filter", "value"),
-        Input("geo-request-type-filter", "value")
-    ]
+    Output("geo-exact-poll", "disabled"),
+    Input("geo-filters", "data"),
+    Input("geo-exact-poll", "n_intervals")
 )
-def update_geo_distribution_graph(selected_continent, selected_country, selected_request):
-    filtered_df = df.copy()
+@instrumented
+def update_geo_distribution_graph(filters, n_intervals=None):
+    return approximate_or_exact(geo_distribution_figure, geo_estimate_figure, chart_filter_args(filters),
+                                ["locations", "z", "hovertext", "customdata"])
+
+@cached_figure
+def geo_distribution_figure(selected_continent, selected_country, selected_request, cross=None):
+    country_counts = QUERY["counts"](COUNTRY, selected_continent, selected_country, selected_request,
+                                     filters=dict(cross or ()))
+    return geo_chart(country_counts)
 
-    if selected_continent:
-        filtered_df = filtered_df[filtered_df[CONTINENT] == selected_continent]
-    if selected_country:
-        filtered_df = filtered_df[filtered_df[COUNTRY] == selected_country]
-    if selected_request:
-        filtered_df = filtered_df[filtered_df[REQUEST_TYPE] == selected_request]
+def geo_estimate_figure(selected_continent, selected_country, selected_request, cross=None):
+    return geo_chart(*sample_estimate(COUNTRY, selected_continent, selected_country, selected_request, cross))
 
-    geo_df = filtered_df.groupby(COUNTRY).size().reset_index(name="Number of Requests")
+# margins are the half-widths of the confidence intervals of estimated counts
+def geo_chart(country_counts, margins=None):
+    locations = country_locations(tuple(country_counts.index))
+    shown = (country_counts.to_numpy() > 0) & pd.notna(locations)
+
+    geo_df = pd.DataFrame({
+        COUNTRY: country_counts.index[shown],
+        "ISO-3": locations[shown],
+        "Number of Requests": country_counts.to_numpy()[shown],
+    })
+    if margins is not None:
+        geo_df[MARGIN] = margins.to_numpy()[shown]
 
     fig = px.choropleth(
         geo_df,
-        locations=COUNTRY,
-        locationmode="country names",
+        locations="ISO-3",
+        locationmode="ISO-3",
+        hover_name=COUNTRY,
+        hover_data=[MARGIN] if margins is not None else None,
+        custom_data=[COUNTRY],
         color="Number of Requests",
         color_continuous_scale=px.colors.sequential.Plasma,
         title="Geographical Distribution of Requests"
@@ -491,20 +3130,31 @@ def update_geo_distribution_graph(selected_continent, selected_country, selected
 # Product Interest Graph (using Platform as Product)
 @app_analysis.callback(
     Output("product-interest-map", "figure"),
-    [Input("product-continent-filter", "value"),
-     Input("product-country-filter", "value")]
+    Output("product-exact-poll", "disabled"),
+    Input("product-filters", "data"),
+    Input("product-exact-poll", "n_intervals")
 )
-def update_product_interest_donut(selected_continent, selected_country):
-    # Filter the dataset
-    product_df = df.copy()
-    if selected_continent:
-        product_df = product_df[product_df[CONTINENT] == selected_continent]
-    if selected_country:
-        product_df = product_df[product_df[COUNTRY] == selected_country]
+@instrumented
+def update_product_interest_donut(filters, n_intervals=None):
+    return approximate_or_exact(product_interest_figure, product_estimate_figure, chart_filter_args(filters),
+                                ["labels", "values"])
+
+@cached_figure
+def product_interest_figure(selected_continent, selected_country, selected_request=None, cross=None):
+    product_counts = QUERY["counts"](PLATFORM, selected_continent, selected_country, selected_request,
+                                     filters=dict(cross or ()))
+    return product_chart(product_counts)
 
+def product_estimate_figure(selected_continent, selected_country, selected_request=None, cross=None):
+    return product_chart(*sample_estimate(PLATFORM, selected_continent, selected_country, selected_request, cross))
+
+def product_chart(product_counts, margins=None):
     # Prepare data
-    product_counts = product_df[PLATFORM].value_counts().reset_index()
+    product_counts = product_counts[product_counts > 0].sort_values(ascending=False, kind="stable")
+    product_counts = product_counts.reset_index()
     product_counts.columns = ['Product', 'Number of Requests']
+    if margins is not None:
+        product_counts[MARGIN] = margins.reindex(product_counts['Product']).to_numpy()
 
     # Define custom color sequence
     custom_colors = ['#1f77b4', '#9467bd', '#ff7f0e']  # blue, purple, orange
@@ -516,119 +3166,118 @@ def update_product_interest_donut(selected_continent, selected_country):
         values='Number of Requests',
         hole=0.4,
         color_discrete_sequence=custom_colors,
+        hover_data=[MARGIN] if margins is not None else None,
         title='Product Interest by Platform (Donut View)'
     )
     fig.update_layout(title_x=0.5)
     return fig
     
-# Country dropdown depends on continent (Product Interest)
-@app_analysis.callback(
-    Output("product-country-filter", "options"),
-    [Input("product-continent-filter", "value")]
-)
-def update_product_country_options(selected_continent):
-    if selected_continent:
-        filtered_countries = df[df[CONTINENT] == selected_continent][COUNTRY].dropna().unique()
-        return [{"label": c, "value": c} for c in sorted(filtered_countries)]
-    else:
-        return [{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())]
-
-# Time period tab - country dropdown depends on continent
-@app_analysis.callback(
-    Output("time-country-filter", "options"),
-    [Input("time-continent-filter", "value")]
-)
-def update_time_country_options(selected_continent):
-    if selected_continent:
-        filtered_countries = df[df[CONTINENT] == selected_continent][COUNTRY].dropna().unique()
-        return [{"label": c, "value": c} for c in sorted(filtered_countries)]
-    else:
-        return [{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())]
-
-# Gender tab - country dropdown depends on continent
-@app_analysis.callback(
-    Output("gender-country-filter", "options"),
-    [Input("gender-continent-filter", "value")]
-)
-def update_gender_country_options(selected_continent):
-    if selected_continent:
-        filtered_countries = df[df[CONTINENT] == selected_continent][COUNTRY].dropna().unique()
-        return [{"label": c, "value": c} for c in sorted(filtered_countries)]
-    else:
-        return [{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())]
-
-# Age tab - country dropdown depends on continent
-@app_analysis.callback(
-    Output("age-country-filter", "options"),
-    [Input("age-continent-filter", "value")]
-)
-def update_age_country_options(selected_continent):
-    if selected_continent:
-        filtered_countries = df[df[CONTINENT] == selected_continent][COUNTRY].dropna().unique()
-        return [{"label": c, "value": c} for c in sorted(filtered_countries)]
-    else:
-        return [{"label": c, "value": c} for c in sorted(df[COUNTRY].dropna().unique())]
- 
 # Updated Time Period Graph with Continent and Country filters
 @app_analysis.callback(
     Output("time-period-graph", "figure"),
+    Output("time-exact-poll", "disabled"),
     [
         Input("time-granularity-filter", "value"),
-        Input("time-continent-filter", "value"),
-        Input("time-country-filter", "value"),
-        Input("time-request-type-filter", "value")
+        Input("time-filters", "data"),
+        Input("time-exact-poll", "n_intervals")
     ]
 )
-def update_time_graph(granularity, selected_continent, selected_country, selected_request):
-    filtered_df = df.copy()
-    if selected_continent:
-        filtered_df = filtered_df[filtered_df[CONTINENT] == selected_continent]
-    if selected_country:
-        filtered_df = filtered_df[filtered_df[COUNTRY] == selected_country]
-    if selected_request:
-        filtered_df = filtered_df[filtered_df[REQUEST_TYPE] == selected_request]
-
-    data = filtered_df.set_index(DATE).resample(granularity)[REQUEST_TYPE].count().reset_index()
-    data.rename(columns={REQUEST_TYPE: 'Number of Requests'}, inplace=True)
+@instrumented
+def update_time_graph(granularity, filters, n_intervals=None):
+    return approximate_or_exact(time_figure, time_estimate_figure, (granularity, *chart_filter_args(filters)), ["x", "y"])
 
+# A daily series over years has more points than the chart has pixels
+def thin_time_series(data):
+    if len(data) <= MAX_TIME_POINTS:
+        return data
+    keep = lttb_indices(data[DATE].to_numpy().astype("int64"), data["Number of Requests"].to_numpy(), MAX_TIME_POINTS)
+    return data.iloc[keep]
+
+@cached_figure
+def time_figure(granularity, selected_continent, selected_country, selected_request, cross=None):
+    data = thin_time_series(time_series_counts(granularity, selected_continent, selected_country, selected_request,
+                                               filters=dict(cross or ())))
+    return time_chart(data)
+
+def time_estimate_figure(granularity, selected_continent, selected_country, selected_request, cross=None):
+    counts, margins = sample_estimate(DATE, selected_continent, selected_country, selected_request, cross, granularity)
+    if len(counts):
+        # Buckets without sampled rows in between count as estimated zeros
+        buckets = pd.date_range(min(counts.index), max(counts.index), freq=TIME_GRANULARITIES[granularity])
+        counts, margins = counts.reindex(buckets, fill_value=0), margins.reindex(buckets, fill_value=0)
+    data = pd.DataFrame({DATE: counts.index, "Number of Requests": counts.to_numpy(), MARGIN: margins.to_numpy()})
+    return time_chart(thin_time_series(data))
+
+# data holds DATE and "Number of Requests", and MARGIN for estimated counts
+def time_chart(data):
     fig = px.line(
-        data, x=DATE, y="Number of Requests", title="Requests Over Time", markers=True
+        data, x=DATE, y="Number of Requests", title="Requests Over Time", markers=True,
+        error_y=MARGIN if MARGIN in data else None
     )
     fig.update_traces(line=dict(color="purple"))
     fig.update_layout(title_x=0.5)
     return fig
 
+# Requests by weekday and hour of day, read from the 7 x 24 Weekday Hour cube
+@app_analysis.callback(
+    Output("weekday-hour-heatmap", "figure"),
+    Input("heatmap-filters", "data")
+)
+@instrumented
+def update_weekday_hour_heatmap(filters):
+    fig = weekday_hour_figure(*chart_filter_args(filters))
+    return figure_or_patch(fig, ["z"])
+
+@cached_figure
+def weekday_hour_figure(selected_continent, selected_country, selected_request, cross=None):
+    counts = QUERY["counts"](WEEK_HOUR, selected_continent, selected_country, selected_request,
+                             filters=dict(cross or ()))
+    fig = go.Figure(go.Heatmap(
+        z=counts.to_numpy().reshape(7, 24),
+        x=[f"{hour:02d}:00" for hour in range(24)],
+        y=WEEKDAY_NAMES,
+        colorscale="Blues",
+        colorbar=dict(title="Requests"),
+        hovertemplate="%{y} %{x}<br>Requests: %{z}<extra></extra>"
+    ))
+    fig.update_layout(
+        title="Requests by Weekday and Hour of Day",
+        title_x=0.5,
+        xaxis_title="Hour of Day",
+        yaxis=dict(autorange="reversed")
+    )
+    return fig
+
 # Updated Gender distribution with continent and country filters
 @app_analysis.callback(
     Output("gender-distribution-graph", "figure"),
-    [
-        Input("gender-continent-filter", "value"),
-        Input("gender-country-filter", "value"),
-        Input("request-type-gender-filter", "value")
-    ]
+    Output("gender-exact-poll", "disabled"),
+    Input("gender-filters", "data"),
+    Input("gender-exact-poll", "n_intervals")
 )
-def update_gender_graph(selected_continent, selected_country, selected_request):
-    # Start with full data
-    df_filtered = df.copy()
-
-    # Apply continent filter first
-    if selected_continent:
-        df_filtered = df_filtered[df_filtered[CONTINENT] == selected_continent]
+@instrumented
+def update_gender_graph(filters, n_intervals=None):
+    return approximate_or_exact(gender_figure, gender_estimate_figure, chart_filter_args(filters), None)
 
-    # Then apply country filter (if selected and if it's in the filtered continent)
-    if selected_country:
-        df_filtered = df_filtered[df_filtered[COUNTRY] == selected_country]
+@cached_figure
+def gender_figure(selected_continent, selected_country, selected_request, cross=None):
+    # Counts per gender for the selected continent, country and request type
+    gender_counts = QUERY["counts"](GENDER, selected_continent, selected_country, selected_request,
+                                    filters=dict(cross or ()))
+    return gender_chart(gender_counts)
 
-    # Then apply request type
-    if selected_request:
-        df_filtered = df_filtered[df_filtered[REQUEST_TYPE] == selected_request]
+def gender_estimate_figure(selected_continent, selected_country, selected_request, cross=None):
+    return gender_chart(*sample_estimate(GENDER, selected_continent, selected_country, selected_request, cross))
 
+def gender_chart(gender_counts, margins=None):
     # Restrict to Male and Female only
-    df_filtered = df_filtered[df_filtered[GENDER].isin(["Male", "Female"])]
+    gender_counts = gender_counts[gender_counts.index.isin(["Male", "Female"]) & (gender_counts > 0)]
 
     # Group by gender
-    gender_data = df_filtered[GENDER].value_counts().reset_index()
+    gender_data = gender_counts.sort_values(ascending=False, kind="stable").reset_index()
     gender_data.columns = ['Gender', 'Requests']
+    if margins is not None:
+        gender_data[MARGIN] = margins.reindex(gender_data['Gender']).to_numpy()
 
     # Color scheme: green for Male, orange for Female
     gender_colors = ['#28a745', '#fd7e14']
@@ -640,6 +3289,7 @@ def update_gender_graph(selected_continent, selected_country, selected_request):
         x='Requests',
         orientation='h',
         color='Gender',
+        error_x=MARGIN if margins is not None else None,
         color_discrete_sequence=gender_colors,
         category_orders={'Gender': ['Male', 'Female']}
     )
@@ -658,35 +3308,30 @@ def update_gender_graph(selected_continent, selected_country, selected_request):
 # Updated Age distribution with continent and country filters
 @app_analysis.callback(
     Output("age-distribution-graph", "figure"),
-    [Input("age-continent-filter", "value"),
-     Input("age-country-filter", "value"),
-     Input("request-type-age-filter", "value")]
+    Output("age-exact-poll", "disabled"),
+    Input("age-filters", "data"),
+    Input("age-exact-poll", "n_intervals")
 )
-def update_age_graph(selected_continent, selected_country, selected_request):
-    # Start with full data
-    df_filtered = df.copy()
-    
-    # Apply continent filter
-    if selected_continent:
-        df_filtered = df_filtered[df_filtered[CONTINENT] == selected_continent]
-    
-    # Apply country filter
-    if selected_country:
-        df_filtered = df_filtered[df_filtered[COUNTRY] == selected_country]
-    
-    # Apply request type filter
-    if selected_request:
-        df_filtered = df_filtered[df_filtered[REQUEST_TYPE] == selected_request]
+@instrumented
+def update_age_graph(filters, n_intervals=None):
+    return approximate_or_exact(age_figure, age_estimate_figure, chart_filter_args(filters), None)
 
-    # Define the correct age group order
-    age_order = ["18-25", "26-35", "36-45", "46-55", "56+"]
+@cached_figure
+def age_figure(selected_continent, selected_country, selected_request, cross=None):
+    # Counts per age group, already in AGE_ORDER
+    age_counts = QUERY["counts"](AGE_GROUP, selected_continent, selected_country, selected_request,
+                                 filters=dict(cross or ()))
+    return age_chart(age_counts)
 
-    # Make Age Group a categorical column with order
-    df_filtered[AGE_GROUP] = pd.Categorical(df_filtered[AGE_GROUP], categories=age_order, ordered=True)
+def age_estimate_figure(selected_continent, selected_country, selected_request, cross=None):
+    age_counts, margins = sample_estimate(AGE_GROUP, selected_continent, selected_country, selected_request, cross)
+    return age_chart(age_counts.reindex(AGE_ORDER, fill_value=0), margins.reindex(AGE_ORDER, fill_value=0))
 
-    # Group and count
-    age_data = df_filtered[AGE_GROUP].value_counts().sort_index().reset_index()
+def age_chart(age_counts, margins=None):
+    age_data = age_counts.reset_index()
     age_data.columns = ['Age Group', 'Requests']
+    if margins is not None:
+        age_data[MARGIN] = margins.to_numpy()
 
     # Custom color palette: pink, green, blue, orange, purple
     custom_colors = ['#ff69b4', '#28a745', '#007bff', '#fd7e14', '#6f42c1']
@@ -697,7 +3342,8 @@ def update_age_graph(selected_continent, selected_country, selected_request):
         x='Age Group',
         y='Requests',
         color='Age Group',
-        category_orders={'Age Group': age_order},
+        error_y=MARGIN if margins is not None else None,
+        category_orders={'Age Group': AGE_ORDER},
         color_discrete_sequence=custom_colors
     )
 
@@ -717,44 +3363,246 @@ def update_age_graph(selected_continent, selected_country, selected_request):
     Output("statistical-analysis-output", "children"),
     [
         Input("statistical-metric", "value"),
-        Input("statistical-request-filter", "value")
+        Input("statistical-request-filter", "value"),
+        Input("statistical-dimension", "value")
     ]
 )
-def update_statistical_analysis(selected_metric, selected_request):
+@instrumented
+def update_statistical_analysis(selected_metric, selected_request, selected_dimension=JOB_TYPE):
     if not selected_metric or not selected_request:
         return "Please select both a metric and a request type."
 
-    # Filter dataset to selected request type
-    filtered_df = df[df[REQUEST_TYPE] == selected_request]
-
-    # Group by Job Type (assuming it represents sales roles)
-    job_counts = filtered_df[JOB_TYPE].value_counts()
+    # Requests per job type (or another group-by column) for the selected request type
+    counts = stats_counts(selected_dimension, selected_request)
 
-    if job_counts.empty:
-        return f"No job data available for '{selected_request}'."
+    if counts.empty:
+        return f"No {STATS_DIMENSIONS[selected_dimension]} data available for '{selected_request}'."
+    if selected_metric not in STATS_METRICS:
+        return "⚠️ Invalid metric selected."
 
+    per = selected_dimension.lower()
+    value = stats_metric(counts, selected_metric)
     if selected_metric == "mean":
-        value = job_counts.mean()
-        return f"🔍 Mean requests per job type for '{selected_request}': {value:.2f}"
+        return f"🔍 Mean requests per {per} for '{selected_request}': {value:.2f}"
     elif selected_metric == "median":
-        value = job_counts.median()
-        return f"📊 Median requests per job type for '{selected_request}': {value:.2f}"
+        return f"📊 Median requests per {per} for '{selected_request}': {value:.2f}"
     elif selected_metric == "mode":
-        mode_val = job_counts.mode()
-        value = mode_val[0] if not mode_val.empty else "N/A"
-        return f"📌 Mode of requests per job type for '{selected_request}': {value}"
+        return f"📌 Mode of requests per {per} for '{selected_request}': {value}"
     elif selected_metric == "std":
-        value = job_counts.std()
         return f"📈 Standard deviation of requests for '{selected_request}': {value:.2f}"
     elif selected_metric == "count":
-        value = job_counts.sum()
         return f"📦 Total requests made for '{selected_request}': {value}"
     else:
-        return "⚠️ Invalid metric selected."
+        return f"📐 {STATS_METRICS[selected_metric]} of requests per {per} for '{selected_request}': {value:.2f}"
+
+# Every metric for every request type side by side, from the same vectors
+@app_analysis.callback(
+    Output("statistical-comparison-table", "children"),
+    Input("statistical-dimension", "value")
+)
+@instrumented
+def update_statistical_comparison(selected_dimension):
+    rows = []
+    for request, counts in stats_table(selected_dimension).iterrows():
+        counts = counts[counts > 0]
+        if counts.empty:
+            continue
+        row = {"Request Type": request}
+        row.update({label: stats_metric(counts, metric) for metric, label in STATS_METRICS.items()})
+        row[f"Top {selected_dimension}"] = counts.idxmax()
+        rows.append(row)
+
+    if not rows:
+        return "No data available."
+    table = pd.DataFrame(rows).round(2).fillna("–")
+    return dbc.Table.from_dataframe(table, striped=True, bordered=True, hover=True, size="sm")
+
+# Overview: the aggregates of every tab for one filter selection, from a
+# single backend pass (see QUERY["overview"])
+def overview_counts(granularity, continent=None, country=None, request=None, filters=None):
+    counts, rows, buckets = QUERY["overview"](continent, country, request, filters)
+    time_series = roll_up_days(counts.pop(DAY).to_numpy(), buckets[granularity])
+    return counts, rows, time_series
+
+@app_analysis.callback(
+    Output("overview-graph", "figure"),
+    [
+        Input("overview-granularity-filter", "value"),
+        Input("overview-filters", "data")
+    ]
+)
+@instrumented
+def update_overview_graph(granularity, filters):
+    return overview_figure(granularity, *chart_filter_args(filters))
+
+@cached_figure
+def overview_figure(granularity, selected_continent, selected_country, selected_request, cross=None):
+    counts, rows, time_series = overview_counts(granularity, selected_continent, selected_country, selected_request,
+                                                dict(cross or ()))
+    countries = counts[COUNTRY][counts[COUNTRY] > 0].sort_values(ascending=False, kind="stable").head(10)
+    genders = counts[GENDER][counts[GENDER] > 0]
+    platforms = counts[PLATFORM][counts[PLATFORM] > 0]
+    jobs = counts[JOB_TYPE].drop(UNKNOWN, errors="ignore")
+    jobs = jobs[jobs > 0].sort_values(ascending=False, kind="stable")
+    time_series = thin_time_series(time_series)
+
+    fig = make_subplots(
+        rows=2, cols=3,
+        specs=[[{"type": "xy"}, {"type": "domain"}, {"type": "xy"}],
+               [{"type": "domain"}, {"type": "xy"}, {"type": "xy"}]],
+        subplot_titles=["Top 10 Countries", "Gender", "Age Group", "Platform", "Job Type", "Requests Over Time"],
+        vertical_spacing=0.15
+    )
+    fig.add_trace(go.Bar(x=countries.to_numpy(), y=countries.index, orientation="h", marker_color=PRIMARY_COLOR), row=1, col=1)
+    fig.add_trace(go.Pie(labels=genders.index, values=genders.to_numpy(), hole=0.4, textinfo="label+percent"), row=1, col=2)
+    fig.add_trace(go.Bar(x=counts[AGE_GROUP].index, y=counts[AGE_GROUP].to_numpy(), marker_color=SECONDARY_COLOR), row=1, col=3)
+    fig.add_trace(go.Pie(labels=platforms.index, values=platforms.to_numpy(), hole=0.4, textinfo="label+percent"), row=2, col=1)
+    fig.add_trace(go.Bar(x=jobs.index, y=jobs.to_numpy(), marker_color=ACCENT_COLOR), row=2, col=2)
+    fig.add_trace(go.Scatter(x=time_series[DATE], y=time_series["Number of Requests"], mode="lines+markers",
+                             line=dict(color="purple")), row=2, col=3)
+
+    fig.update_yaxes(autorange="reversed", row=1, col=1)
+    fig.update_layout(title=f"Overview: {rows:,} Requests", title_x=0.5, showlegend=False, height=750)
+    return fig
+
+# Equality filters of an API request (see API_FILTERS)
+def api_filters(args):
+    return {col: args.get(name) or None for name, col in API_FILTERS.items()}
+
+# The same overview as JSON for external consumers:
+#   /api/overview?continent=Africa&country=Kenya&request=Demo&granularity=W
+@server.route("/api/overview")
+@instrumented
+def overview_api():
+    args = flask.request.args
+    granularity = args.get("granularity", "MS")
+    if granularity not in TIME_GRANULARITIES:
+        return flask.Response(f"Unknown granularity {granularity!r}; use one of {', '.join(TIME_GRANULARITIES)}\n",
+                              status=400, mimetype="text/plain")
+    selected = api_filters(args)
+    cross = {col: selected[col] for col in CROSS_FILTERS if selected[col]}
+    # Every filter parameter is echoed, null when not supplied
+    filters = {name: selected[col] for name, col in API_FILTERS.items()}
+    counts, rows, time_series = overview_counts(granularity, selected[CONTINENT], selected[COUNTRY], selected[REQUEST_TYPE],
+                                                cross)
+    return {
+        "dataset_version": DATA_VERSION,
+        "filters": filters,
+        "rows": rows,
+        "counts": {dimension: {str(label): int(n) for label, n in values.items()} for dimension, values in counts.items()},
+        "time": {
+            "granularity": granularity,
+            "dates": time_series[DATE].dt.strftime("%Y-%m-%d").tolist(),
+            "requests": time_series["Number of Requests"].tolist(),
+        },
+    }
+
+# Export
+# The rows matching the filters as a download in the CSV's own layout. Rows
+# are streamed while the backend produces them, EXPORT_CHUNK_ROWS at a time,
+# so memory stays flat however many rows match and the download starts at once:
+#   /api/export?continent=Africa&request=Demo%20Request&format=csv&gzip=1
+# format is csv (default) or parquet (needs pyarrow). gzip=1 compresses a CSV
+# into .csv.gz and the pages of a Parquet file with gzip instead of snappy.
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "application/gzip"),
+    "parquet": ("application/vnd.apache.parquet", "application/vnd.apache.parquet"),
+}
+
+def csv_export_chunks(frames, compress):
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    header = True
+    for frame in frames:
+        data = frame.to_csv(index=False, header=header, date_format="%Y-%m-%d", lineterminator="\n").encode()
+        header = False
+        data = compressor.compress(data) if compressor else data
+        if data:
+            yield data
+    if header:
+        data = (",".join(columns) + "\n").encode()
+        yield compressor.compress(data) if compressor else data
+    if compressor:
+        yield compressor.flush()
+
+# Write-only file handing out what was written since the last drain(); tell()
+# keeps counting, as the Parquet footer records offsets into the whole file
+class ExportSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+# One row group per chunk, each sent as soon as it is written
+def parquet_export_chunks(frames, compress):
+    schema = pyarrow.schema([(col, pyarrow.date32() if col == DATE else pyarrow.string()) for col in columns])
+    sink = ExportSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="gzip" if compress else "snappy")
+    try:
+        for frame in frames:
+            writer.write_table(pyarrow.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+@server.route("/api/export")
+def export_api():
+    args = flask.request.args
+    export_format = args.get("format", "csv")
+    compress = args.get("gzip", "0") == "1"
+    if export_format not in EXPORT_FORMATS:
+        return flask.Response(f"Unknown format {export_format!r}; use one of {', '.join(EXPORT_FORMATS)}\n",
+                              status=400, mimetype="text/plain")
+    if export_format == "parquet" and pyarrow is None:
+        return flask.Response("Parquet export needs pyarrow; install it or use format=csv\n",
+                              status=501, mimetype="text/plain")
+
+    frames = QUERY["export"](api_filters(args))
+    if export_format == "csv":
+        chunks = csv_export_chunks(frames, compress)
+        filename = "ona-export.csv.gz" if compress else "ona-export.csv"
+    else:
+        chunks = parquet_export_chunks(frames, compress)
+        filename = "ona-export.parquet"
+    return flask.Response(
+        flask.stream_with_context(instrumented_stream("export_api", chunks)),
+        mimetype=EXPORT_FORMATS[export_format][compress],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Dataset-Version": DATA_VERSION},
+    )
 
 import os
 
 if __name__ == '__main__':
+    if "--build-snapshot" in sys.argv and QUERY_BACKEND == "sqlite":
+        build_sqlite_store(DATA_PATH)
+        sys.exit(0)
+    if "--build-snapshot" in sys.argv and QUERY_BACKEND == "partitioned":
+        build_partition_store(DATA_PATH)
+        sys.exit(0)
+    if "--build-snapshot" in sys.argv:
+        # Importing the module already rebuilt a stale snapshot; this forces a fresh one
+        source = file_fingerprint(DATA_PATH)
+        source["sha256"] = file_sha256(DATA_PATH)
+        write_snapshot(df if COMPACT_DATA else compact_frame(df), source, force=True)
+        print(f"Wrote dataset snapshot for {DATA_PATH} to {SNAPSHOT_DIR}")
+        sys.exit(0)
+
     port = int(os.environ.get('PORT', 8080))
     app_analysis.run(host='0.0.0.0', port=port, debug=False)
 
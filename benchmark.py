@@ -0,0 +1,243 @@
+# Benchmarks for the dashboard: cold start, peak memory and the latency of
+# every chart callback on synthetic Ona-shaped datasets.
+#
+#   python benchmark.py                       # 30k, 1M and 10M rows, JSON on stdout
+#   python benchmark.py --rows 30000 1000000 --repeat 10 --out bench.json
+#   ONA_QUERY_BACKEND=sqlite python benchmark.py --rows 1000000
+#
+# Each dataset size is measured in fresh interpreters (one loading the CSV,
+# one loading the snapshot it produced), so import-time work and peak RSS are
+# those of a real worker start.
+import argparse
+import inspect
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROWS = [30_000, 1_000_000, 10_000_000]
+SOURCE_CSV = os.environ.get("ONA_CSV", "Ona.csv")
+
+# Synthetic rows reuse the location/profile/request part of real rows from
+# Ona.csv, so country-continent pairs and the sparse Job Type column keep their
+# shape; inquiry time and date are drawn independently over the source's date
+# range. Writing pre-rendered line fragments keeps 10M rows to seconds.
+def generate_dataset(path, rows, seed=0):
+    source = pd.read_csv(SOURCE_CSV, dtype=str, keep_default_na=False)
+    rng = np.random.default_rng(seed)
+
+    header = ",".join(source.columns)
+    profiles = source[source.columns[:8]].agg(",".join, axis=1).to_numpy(dtype=object)
+    dates = pd.to_datetime(source[source.columns[9]], errors="coerce").dropna()
+    days = pd.date_range(dates.min(), dates.max(), freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    times = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        chunk = 1_000_000
+        for start in range(0, rows, chunk):
+            n = min(chunk, rows - start)
+            lines = (
+                profiles[rng.integers(0, len(profiles), n)] + ","
+                + times[rng.integers(0, len(times), n)] + ","
+                + days[rng.integers(0, len(days), n)]
+            )
+            f.write("\n".join(lines) + "\n")
+
+def peak_rss_mb():
+    # VmHWM is this process's own peak; on Linux ru_maxrss also carries the
+    # parent's peak across fork + exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def latency_stats(samples):
+    ms = [s * 1000 for s in samples]
+    return {"median_ms": round(statistics.median(ms), 3), "min_ms": round(min(ms), 3), "max_ms": round(max(ms), 3)}
+
+# Filter combinations from "no filter" down to continent + country + request,
+# picked from the most frequent values so every combination has data
+def filter_combinations(app):
+    continent = app.QUERY["value_counts"](app.CONTINENT, {}).index[0]
+    country = app.QUERY["value_counts"](app.COUNTRY, {app.CONTINENT: continent}).index[0]
+    request = app.QUERY["value_counts"](app.REQUEST_TYPE, {}).index[0]
+    return [
+        (None, None, None),
+        (continent, None, None),
+        (continent, country, None),
+        (None, None, request),
+        (continent, country, request),
+    ]
+
+def label(values):
+    def text(v):
+        if v is None:
+            return "*"
+        if isinstance(v, tuple):
+            return "&".join(f"{column}={value}" for column, value in v)
+        return str(v)
+    return "|".join(text(v) for v in values)
+
+# Figure builders are called without the figure cache or instrumentation, so every
+# sample pays for the aggregation and the figure construction
+def callback_cases(app):
+    cases = []
+    # A gender cross-filter, as set by clicking a bar of the gender chart
+    cross = ((app.GENDER, app.QUERY["value_counts"](app.GENDER, {}).index[0]),)
+    for continent, country, request in filter_combinations(app):
+        cases.append(("geo", (continent, country, request), inspect.unwrap(app.geo_distribution_figure)))
+        cases.append(("geo_cross_filtered", (continent, country, request, cross), inspect.unwrap(app.geo_distribution_figure)))
+        cases.append(("gender", (continent, country, request), inspect.unwrap(app.gender_figure)))
+        cases.append(("age", (continent, country, request), inspect.unwrap(app.age_figure)))
+        cases.append(("weekday_hour", (continent, country, request), inspect.unwrap(app.weekday_hour_figure)))
+        cases.append(("product", (continent, country), inspect.unwrap(app.product_interest_figure)))
+        for granularity in app.TIME_GRANULARITIES:
+            cases.append(("time", (granularity, continent, country, request), inspect.unwrap(app.time_figure)))
+        cases.append(("overview", ("MS", continent, country, request), inspect.unwrap(app.overview_figure)))
+        if request is not None:
+            for metric in app.STATS_METRICS:
+                cases.append(("statistics", (metric, request), inspect.unwrap(app.update_statistical_analysis)))
+    for dimension in app.STATS_DIMENSIONS:
+        cases.append(("statistics_comparison", (dimension,), inspect.unwrap(app.update_statistical_comparison)))
+    return cases
+
+def measure_callbacks(app, repeat):
+    results = []
+    for name, args, func in callback_cases(app):
+        samples = []
+        for _ in range(repeat):
+            elapsed, output = timed(func, *args)
+            samples.append(elapsed)
+        result = {"callback": name, "filters": label(args)}
+        result.update(latency_stats(samples))
+        if hasattr(output, "to_json"):
+            result["payload_bytes"] = len(output.to_json())
+        results.append(result)
+    return results
+
+# The steps of the CSV load path, timed one by one on the same file
+def measure_load_phases(app, path):
+    phases = {}
+    phases["read_csv_s"], frame = timed(lambda: pd.read_csv(path, sep=",", names=app.columns, skiprows=1))
+    phases["to_datetime_s"], frame[app.DATE] = timed(pd.to_datetime, frame[app.DATE])
+    phases["derived_columns_s"], frame = timed(app.add_derived_columns, frame)
+    if app.COMPACT_DATA:
+        phases["compact_s"], frame = timed(app.compact_frame, frame)
+    phases["cubes_s"], _ = timed(app.build_cubes, frame)
+    phases["filter_index_s"], _ = timed(app.build_filter_index, frame, app.FILTER_COLUMNS)
+    return {k: round(v, 4) for k, v in phases.items()}
+
+# Runs in a fresh interpreter with ONA_CSV/ONA_SNAPSHOT_DIR pointing at the
+# generated dataset; prints one JSON object
+def measure(path, repeat, detailed):
+    start = time.perf_counter()
+    import app
+    result = {
+        "import_s": round(time.perf_counter() - start, 4),
+        "peak_rss_after_import_mb": peak_rss_mb(),
+    }
+    if detailed:
+        result["callbacks"] = measure_callbacks(app, repeat)
+        result["peak_rss_after_callbacks_mb"] = peak_rss_mb()
+        result["load_phases"] = measure_load_phases(app, path)
+    print(json.dumps(result))
+
+def run_child(path, snapshot_dir, repeat, detailed):
+    env = dict(os.environ, ONA_CSV=path, ONA_SNAPSHOT_DIR=snapshot_dir, ONA_INGEST_INTERVAL="0")
+    env.pop("ONA_DELTA_DIR", None)
+    env.pop("ONA_FIGURE_CACHE_DIR", None)
+    cmd = [sys.executable, os.path.abspath(__file__), "--measure", path, "--repeat", str(repeat)]
+    if detailed:
+        cmd.append("--detailed")
+    out = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def benchmark(rows, repeat, workdir):
+    path = os.path.join(workdir, f"ona-{rows}.csv")
+    snapshot_dir = os.path.join(workdir, f"snapshot-{rows}")
+    generate_seconds, _ = timed(generate_dataset, path, rows)
+
+    # First start parses the CSV and writes the snapshot; the second loads it
+    cold = run_child(path, snapshot_dir, repeat, detailed=False)
+    warm = run_child(path, snapshot_dir, repeat, detailed=True)
+    result = {
+        "rows": rows,
+        "csv_bytes": os.path.getsize(path),
+        "generate_s": round(generate_seconds, 2),
+        "cold_start_csv_s": cold["import_s"],
+        "cold_start_csv_peak_rss_mb": cold["peak_rss_after_import_mb"],
+        "cold_start_snapshot_s": warm["import_s"],
+        "cold_start_snapshot_peak_rss_mb": warm["peak_rss_after_import_mb"],
+        "peak_rss_after_callbacks_mb": warm["peak_rss_after_callbacks_mb"],
+        "load_phases": warm["load_phases"],
+        "callbacks": warm["callbacks"],
+    }
+    os.remove(path)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dataset load and dashboard callbacks")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="dataset sizes to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per callback and filter combination")
+    parser.add_argument("--out", help="write the JSON results here instead of stdout")
+    parser.add_argument("--workdir", help="directory for the generated datasets (default: a temp dir)")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--detailed", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.repeat, args.detailed)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ona-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        "query_backend": os.environ.get("ONA_QUERY_BACKEND", "memory"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": [],
+    }
+    try:
+        for rows in args.rows:
+            print(f"Benchmarking {rows} rows...", file=sys.stderr)
+            results["results"].append(benchmark(rows, args.repeat, workdir))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# Gunicorn settings for the dashboard (see ProcFile)
+import gc
+import os
+
+bind = "0.0.0.0:" + os.environ.get("PORT", "8080")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+timeout = 120
+
+# Threaded workers: a slow figure build holds one request thread, not the
+# whole worker. The builds themselves are capped per worker by
+# ONA_FIGURE_BUILD_THREADS (see cached_figure in app.py).
+worker_class = "gthread"
+threads = int(os.environ.get("ONA_THREADS", "8"))
+
+# Import app.py once in the master: the dataset is memory-mapped from the
+# snapshot and the count cubes are built before forking, so every worker
+# shares the same read-only pages instead of loading its own copy
+preload_app = True
+
+def pre_fork(server, worker):
+    # Objects created during preload are moved out of the garbage collector's
+    # generations, so collections in a worker never write to (and copy) them
+    gc.freeze()